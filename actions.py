@@ -20,8 +20,12 @@ Misha Schwartz, and Jaisie Sin
 === Module Description ===
 
 This file contains the different actions that can be made by a Player.
+
+The keys bound to each action, ACTION_KEY and KEY_ACTION, are pygame key
+codes. They are only created when first used, so that the actions can be
+used without pygame (e.g., to play games without a display).
 """
-import pygame
+from typing import Dict, Optional, Tuple
 
 # Actions that can be performed in the game
 ROTATE_CLOCKWISE = ('rotate', 1)
@@ -66,16 +70,27 @@ ACTION_PENALTY = {
     PASS: 0
 }
 
-ACTION_KEY = {
-    ROTATE_CLOCKWISE: pygame.K_d,
-    ROTATE_COUNTER_CLOCKWISE: pygame.K_a,
-    SWAP_HORIZONTAL: pygame.K_q,
-    SWAP_VERTICAL: pygame.K_e,
-    SMASH: pygame.K_SPACE,
-    COMBINE: pygame.K_c,
-    PAINT: pygame.K_r,
-    PASS: pygame.K_TAB
-}
 
-# Create a dictionary that is ACTION_KEY inverted
-KEY_ACTION = {value: key for key, value in ACTION_KEY.items()}
+def __getattr__(name: str) -> Dict:
+    """Return ACTION_KEY or KEY_ACTION, creating both the first time either
+    is used.
+    """
+    if name not in ('ACTION_KEY', 'KEY_ACTION'):
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    import pygame
+
+    action_key: Dict[Tuple[str, Optional[int]], int] = {
+        ROTATE_CLOCKWISE: pygame.K_d,
+        ROTATE_COUNTER_CLOCKWISE: pygame.K_a,
+        SWAP_HORIZONTAL: pygame.K_q,
+        SWAP_VERTICAL: pygame.K_e,
+        SMASH: pygame.K_SPACE,
+        COMBINE: pygame.K_c,
+        PAINT: pygame.K_r,
+        PASS: pygame.K_TAB
+    }
+    globals()['ACTION_KEY'] = action_key
+    # Create a dictionary that is ACTION_KEY inverted
+    globals()['KEY_ACTION'] = {value: key for key, value in action_key.items()}
+    return globals()[name]
@@ -0,0 +1,683 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains an array-backed board engine. An ArrayBoard stores the
+whole quadtree in a single flat buffer of integers instead of one Python
+object per block, and ArrayBlock is a lightweight view onto one node of that
+buffer that supports the same public API as Block.
+"""
+from __future__ import annotations
+from array import array
+from collections import deque
+from typing import List, Optional, Tuple
+import random
+import math
+
+from block import Block, _uniform_hash
+from settings import colour_name, COLOUR_LIST
+
+# The number of integers stored for each node in the buffer, and the offset
+# of each field within a node's record.
+_STRIDE = 3
+_KIND = 0
+_COLOUR = 1
+_CHILD = 2
+
+# The values stored in the kind field of a node's record.
+_LEAF = 0
+_PARENT = 1
+
+# The colour index stored for nodes that have children, and the child offset
+# stored for leaves.
+_NO_COLOUR = -1
+_NO_CHILD = -1
+
+
+def generate_array_board(max_depth: int, size: int,
+                         rng: Optional[random.Random] = None) -> ArrayBlock:
+    """Return a new array-backed game board with a depth of <max_depth> and
+    dimensions of <size> by <size>, drawn from <rng>, or from the random
+    module if it is None.
+
+    The board is generated the same way generate_board generates a Block, so
+    the same seed gives the same board with either engine.
+
+    >>> board = generate_array_board(3, 750)
+    >>> board.max_depth
+    3
+    >>> len(board.children) == 4
+    True
+    """
+    if rng is None:
+        rng = random
+    colour = rng.choice(COLOUR_LIST)
+    board = ArrayBoard(size, max_depth, COLOUR_LIST.index(colour))
+    root = board.root()
+    root.smash(rng=rng)
+
+    return root
+
+
+class ArrayBoard:
+    """The storage for a Blocky board, as a flat buffer of node records.
+
+    Each node is stored as three consecutive integers in <nodes>: its kind
+    (leaf or parent), the index of its colour in COLOUR_LIST, and the node
+    number of its first child. The four children of a node are always stored
+    as four consecutive records, in the same order as Block.children.
+
+    === Public Attributes ===
+    size:
+        The height and width of the whole board.
+    max_depth:
+        The deepest level allowed in the board.
+    nodes:
+        The node records of the board. Node 0 is the root.
+
+    === Representation Invariants ===
+    - len(nodes) % 3 == 0
+    - A leaf's colour index is a valid index into COLOUR_LIST, and its
+      first child is -1.
+    - A parent's colour index is -1, and its first child is the node number
+      of the first of four consecutive records.
+    """
+    # === Private Attributes ===
+    # _free:
+    #   The node numbers of groups of four consecutive records that are no
+    #   longer part of the tree (because their parent was combined, or a
+    #   smash was undone), and can be reused by smash.
+    size: int
+    max_depth: int
+    nodes: array
+    _free: List[int]
+
+    def __init__(self, size: int, max_depth: int, colour_index: int) -> None:
+        """Initialize this board as a single leaf of the colour at
+        <colour_index> in COLOUR_LIST.
+        """
+        self.size = size
+        self.max_depth = max_depth
+        self.nodes = array('i', [_LEAF, colour_index, _NO_CHILD])
+        self._free = []
+
+    @classmethod
+    def from_block(cls, block: Block) -> ArrayBoard:
+        """Return a new ArrayBoard holding the same tree as <block>.
+
+        <block> becomes the root of the new board, so its level must be 0.
+        """
+        board = cls(block.size, block.max_depth, _NO_COLOUR)
+        board.nodes = array('i')
+        pending = deque([block])
+        while pending:
+            b = pending.popleft()
+            if len(b.children) == 0:
+                board.nodes.extend([_LEAF, COLOUR_LIST.index(b.colour),
+                                    _NO_CHILD])
+            else:
+                first = len(board.nodes) // _STRIDE + len(pending) + 1
+                board.nodes.extend([_PARENT, _NO_COLOUR, first])
+                pending.extend(b.children)
+        return board
+
+    def root(self) -> ArrayBlock:
+        """Return a view of the root of this board.
+        """
+        return ArrayBlock(self, 0, (0, 0), self.size, 0)
+
+    def copy(self) -> ArrayBoard:
+        """Return an independent copy of this board.
+
+        The copy is made with a single copy of the node buffer.
+        """
+        board = ArrayBoard.__new__(ArrayBoard)
+        board.size = self.size
+        board.max_depth = self.max_depth
+        board.nodes = array('i', self.nodes)
+        board._free = self._free[:]
+        return board
+
+    def num_nodes(self) -> int:
+        """Return the number of nodes in the tree of this board.
+        """
+        return len(self.nodes) // _STRIDE - 4 * len(self._free)
+
+    def to_block(self) -> Block:
+        """Return a new Block that holds the same tree as this board.
+        """
+        return self.root().to_block()
+
+    def _allocate(self) -> int:
+        """Return the node number of four consecutive records that are not
+        part of the tree, reusing freed records when possible.
+        """
+        if self._free:
+            return self._free.pop()
+        first = len(self.nodes) // _STRIDE
+        self.nodes.extend([_LEAF, _NO_COLOUR, _NO_CHILD] * 4)
+        return first
+
+    def _release(self, first: int) -> None:
+        """Make the four consecutive records starting at node <first>, and
+        the records of all their descendants, free to be reused.
+        """
+        pending = [first]
+        while pending:
+            group = pending.pop()
+            self._free.append(group)
+            for child in range(group, group + 4):
+                if self.nodes[child * _STRIDE + _KIND] == _PARENT:
+                    pending.append(self.nodes[child * _STRIDE + _CHILD])
+
+    def _permute(self, first: int, order: Tuple[int, int, int, int]) -> None:
+        """Reorder the four consecutive records starting at node <first> so
+        that the record at position i becomes the record previously at
+        position order[i].
+
+        Since a record holds its first child, the subtrees move with it.
+        """
+        start = first * _STRIDE
+        end = start + 4 * _STRIDE
+        old = self.nodes[start:end]
+        new = array('i')
+        for i in order:
+            new.extend(old[i * _STRIDE:(i + 1) * _STRIDE])
+        self.nodes[start:end] = new
+
+
+class ArrayBlock:
+    """A view of one block of an ArrayBoard.
+
+    An ArrayBlock has the same public attributes and methods as a Block, and
+    can be used wherever a Block is read. Views are cheap to create and hold
+    no tree data of their own: two views of the same node see each other's
+    changes.
+
+    === Public Attributes ===
+    position:
+        The (x, y) coordinates of the upper left corner of this Block.
+    size:
+        The height and width of this square Block.
+    level:
+        The level of this block within the overall block structure.
+    max_depth:
+        The deepest level allowed in the overall block structure.
+
+    === Representation Invariants ===
+    - The position, size and level of this view are consistent with the path
+      from the root of the board to the viewed node.
+    """
+    # === Private Attributes ===
+    # _board:
+    #   The board that stores the viewed node.
+    # _node:
+    #   The node number of the viewed node in _board.
+    position: Tuple[int, int]
+    size: int
+    level: int
+    max_depth: int
+    _board: ArrayBoard
+    _node: int
+
+    def __init__(self, board: ArrayBoard, node: int,
+                 position: Tuple[int, int], size: int, level: int) -> None:
+        """Initialize this view of node <node> of <board>, which has the given
+        <position>, <size> and <level>.
+        """
+        self._board = board
+        self._node = node
+        self.position = position
+        self.size = size
+        self.level = level
+        self.max_depth = board.max_depth
+
+    @property
+    def colour(self) -> Optional[Tuple[int, int, int]]:
+        """The colour of this block, or None if it has children.
+        """
+        index = self._board.nodes[self._node * _STRIDE + _COLOUR]
+        if index == _NO_COLOUR:
+            return None
+        return COLOUR_LIST[index]
+
+    @property
+    def children(self) -> List[ArrayBlock]:
+        """Views of the children of this block, in the same order as
+        Block.children.
+        """
+        record = self._node * _STRIDE
+        if self._board.nodes[record + _KIND] == _LEAF:
+            return []
+        first = self._board.nodes[record + _CHILD]
+        size = self._child_size()
+        x, y = self.position
+        positions = [(x + size, y), (x, y), (x, y + size),
+                     (x + size, y + size)]
+        return [ArrayBlock(self._board, first + i, positions[i], size,
+                           self.level + 1) for i in range(4)]
+
+    def grid_hash(self) -> int:
+        """Return a hash of the unit cells of this block, which is the same as
+        the hash returned by Block.grid_hash for an equal Block.
+        """
+        return _grid_hash(self._board, self._node, self.max_depth - self.level)
+
+    def set_lazy(self, lazy: bool) -> None:
+        """Do nothing, since views always derive their positions from the path
+        down to them, whether or not <lazy> is set.
+        """
+        return
+
+    def __str__(self) -> str:
+        """Return this block in the same format as Block.__str__.
+        """
+        indents = '\t' * self.level
+        children = self.children
+        if len(children) == 0:
+            return f'{indents}Leaf: colour={colour_name(self.colour)}, ' \
+                   f'pos={self.position}, size={self.size}, ' \
+                   f'level={self.level}\n'
+        result = f'{indents}Parent: pos={self.position},' \
+                 f'size={self.size}, level={self.level}\n'
+        for child in children:
+            result += str(child)
+        return result
+
+    def __eq__(self, other: object) -> bool:
+        """Return True iff this block and all its descendants are equivalent
+        to the <other> block and all its descendants.
+
+        <other> may be an ArrayBlock or a Block.
+        """
+        if isinstance(other, ArrayBlock) and \
+                self.position == other.position and \
+                self.size == other.size and self.level == other.level and \
+                self.max_depth == other.max_depth:
+            # Two views of equal-shaped regions: compare the records directly.
+            return _same_subtree(self._board, self._node,
+                                 other._board, other._node)
+        mine = self.children
+        theirs = other.children
+        if len(mine) == 0 and len(theirs) == 0:
+            return self.position == other.position and \
+                self.size == other.size and \
+                self.colour == other.colour and \
+                self.level == other.level and \
+                self.max_depth == other.max_depth
+        elif len(mine) != len(theirs):
+            return False
+        for i in range(4):
+            if mine[i] != theirs[i]:
+                return False
+        return True
+
+    def _cache_get(self, key: str) -> Optional[object]:
+        """Return None, since views do not cache values computed from their
+        subtree.
+        """
+        return None
+
+    def _cache_put(self, key: str, value: object) -> None:
+        """Do nothing, since views do not cache values computed from their
+        subtree.
+        """
+        return
+
+    def _child_size(self) -> int:
+        """Return the size of this block's children.
+        """
+        return round(self.size / 2.0)
+
+    def _record(self) -> int:
+        """Return the offset of this block's record in the board's buffer.
+        """
+        return self._node * _STRIDE
+
+    def _is_leaf(self) -> bool:
+        """Return True iff this block has no children.
+        """
+        return self._board.nodes[self._record() + _KIND] == _LEAF
+
+    def smashable(self) -> bool:
+        """Return True iff this block can be smashed.
+        """
+        return self.level < self.max_depth and self._is_leaf()
+
+    def smash(self, journal: Optional[List[ArrayUndoRecord]] = None,
+              rng: Optional[random.Random] = None) -> bool:
+        """Sub-divide this block so that it has four children randomly
+        generated from <rng>, or from the random module if it is None, in the
+        same way as Block.smash.
+
+        If <journal> is given and the smash is performed, a record that undoes
+        it is appended to <journal>.
+
+        Return True iff the smash was performed.
+        """
+        if not self.smashable():
+            return False
+        if journal is not None:
+            journal.append(ArrayUndoRecord(self, 0))
+        if rng is None:
+            rng = random
+        nodes = self._board.nodes
+        first = self._board._allocate()
+        for i in range(4):
+            record = (first + i) * _STRIDE
+            nodes[record + _KIND] = _LEAF
+            nodes[record + _COLOUR] = \
+                COLOUR_LIST.index(rng.choice(COLOUR_LIST))
+            nodes[record + _CHILD] = _NO_CHILD
+        record = self._record()
+        nodes[record + _KIND] = _PARENT
+        nodes[record + _COLOUR] = _NO_COLOUR
+        nodes[record + _CHILD] = first
+
+        for child in self.children:
+            rand = rng.random()
+            if rand < math.exp(-0.25 * child.level):
+                child.smash(rng=rng)
+            else:
+                colour = rng.choice(COLOUR_LIST)
+                nodes[child._record() + _COLOUR] = COLOUR_LIST.index(colour)
+        return True
+
+    def swap(self, direction: int,
+             journal: Optional[List[ArrayUndoRecord]] = None) -> bool:
+        """Swap the children of this block, in the same way as Block.swap.
+
+        If <journal> is given and the swap is performed, a record that undoes
+        it is appended to <journal>.
+
+        Return True iff the swap was performed.
+
+        Precondition: <direction> is either 0 or 1
+        """
+        if self._is_leaf() or direction not in (0, 1):
+            return False
+        if journal is not None:
+            journal.append(ArrayUndoRecord(self, 0))
+        first = self._board.nodes[self._record() + _CHILD]
+        if direction == 1:
+            self._board._permute(first, (3, 2, 1, 0))
+        else:
+            self._board._permute(first, (1, 0, 3, 2))
+        return True
+
+    def rotate(self, direction: int,
+               journal: Optional[List[ArrayUndoRecord]] = None) -> bool:
+        """Rotate this block and all its descendants, in the same way as
+        Block.rotate.
+
+        If <journal> is given and the rotation is performed, a record that
+        undoes it is appended to <journal>.
+
+        Return True iff the rotate was performed.
+
+        Precondition: <direction> is either 1 or 3.
+        """
+        if self._is_leaf() or direction not in (1, 3):
+            return False
+        if journal is not None:
+            journal.append(ArrayUndoRecord(self, direction))
+        order = (1, 2, 3, 0) if direction == 1 else (3, 0, 1, 2)
+        nodes = self._board.nodes
+        pending = [self._node]
+        while pending:
+            node = pending.pop()
+            first = nodes[node * _STRIDE + _CHILD]
+            self._board._permute(first, order)
+            for child in range(first, first + 4):
+                if nodes[child * _STRIDE + _KIND] == _PARENT:
+                    pending.append(child)
+        return True
+
+    def paint(self, colour: Tuple[int, int, int],
+              journal: Optional[List[ArrayUndoRecord]] = None) -> bool:
+        """Change this block's colour iff it is a leaf at a level of max_depth
+        and its colour is different from <colour>.
+
+        If <journal> is given and the colour is changed, a record that undoes
+        it is appended to <journal>.
+
+        Return True iff this block's colour was changed.
+        """
+        if self._is_leaf() and self.level == self.max_depth and \
+                self.colour != colour:
+            if journal is not None:
+                journal.append(ArrayUndoRecord(self, 0))
+            self._board.nodes[self._record() + _COLOUR] = \
+                COLOUR_LIST.index(colour)
+            return True
+        return False
+
+    def combine(self, journal: Optional[List[ArrayUndoRecord]] = None) \
+            -> bool:
+        """Turn this block into a leaf based on the majority colour of its
+        children, in the same way as Block.combine.
+
+        If <journal> is given and this block is combined, a record that undoes
+        it is appended to <journal>.
+
+        Return True iff this block was turned into a leaf node.
+        """
+        if self.level != self.max_depth - 1 or self._is_leaf():
+            return False
+        nodes = self._board.nodes
+        first = nodes[self._record() + _CHILD]
+        counts = [0] * len(COLOUR_LIST)
+        for child in range(first, first + 4):
+            counts[nodes[child * _STRIDE + _COLOUR]] += 1
+        most = max(counts)
+        if counts.count(most) != 1:
+            return False
+        if journal is not None:
+            journal.append(ArrayUndoRecord(self, 0))
+        record = self._record()
+        nodes[record + _KIND] = _LEAF
+        nodes[record + _COLOUR] = counts.index(most)
+        nodes[record + _CHILD] = _NO_CHILD
+        self._board._free.append(first)
+        return True
+
+    def create_copy(self) -> ArrayBlock:
+        """Return a deep copy of this block, stored in a new ArrayBoard.
+
+        Copying the root of a board copies the whole node buffer at once.
+        """
+        if self._node == 0 and self.level == 0:
+            return self._board.copy().root()
+        board = ArrayBoard(self.size, self.max_depth, _NO_COLOUR)
+        board.nodes = array('i')
+        pending = deque([self._node])
+        while pending:
+            node = pending.popleft()
+            record = node * _STRIDE
+            if self._board.nodes[record + _KIND] == _LEAF:
+                board.nodes.extend(self._board.nodes[record:record + _STRIDE])
+            else:
+                first = len(board.nodes) // _STRIDE + len(pending) + 1
+                board.nodes.extend([_PARENT, _NO_COLOUR, first])
+                child = self._board.nodes[record + _CHILD]
+                pending.extend(range(child, child + 4))
+        return ArrayBlock(board, 0, self.position, self.size, self.level)
+
+    def path_copy(self, target: ArrayBlock, subtree: bool = False) \
+            -> Tuple[ArrayBlock, ArrayBlock]:
+        """Return a copy of this block together with the copy of <target>,
+        like Block.path_copy.
+
+        The copy is made with a single copy of the node buffer, so it shares
+        nothing with this block, and <subtree> makes no difference.
+
+        Precondition: <target> is this block or one of its descendants.
+        """
+        copy = self.create_copy()
+        target_copy = copy
+        for i in self._path_to(target):
+            target_copy = target_copy.children[i]
+        return copy, target_copy
+
+    def _path_to(self, block: ArrayBlock) -> List[int]:
+        """Return the index of each child on the way from this block down to
+        <block>, like Block._path_to.
+
+        Precondition: <block> is this block or one of its descendants.
+        """
+        nodes = self._board.nodes
+        pending = []
+        node, path = self._node, []
+        while node != block._node:
+            if nodes[node * _STRIDE + _KIND] == _PARENT:
+                first = nodes[node * _STRIDE + _CHILD]
+                for i in range(4):
+                    pending.append((first + i, path + [i]))
+            node, path = pending.pop()
+        return path
+
+    def to_block(self) -> Block:
+        """Return a new Block that holds the same subtree as this view.
+        """
+        block = Block(self.position, self.size, self.colour, self.level,
+                      self.max_depth)
+        block.children = [child.to_block() for child in self.children]
+        return block
+
+
+class ArrayUndoRecord:
+    """A record of one change made to an ArrayBlock, which can undo that
+    change in the same way as an UndoRecord, so that a journal of them can be
+    undone with block.undo.
+
+    === Public Attributes ===
+    block:
+        The view of the block that was changed.
+    record:
+        The record of <block> in the board's buffer before the change.
+    children:
+        The records of the children of <block> before the change, which are
+        empty if it had none.
+    rotation:
+        The direction in which <block> was rotated, or 0 if the change was not
+        a rotation.
+
+    === Representation Invariants ===
+    - rotation in (0, 1, 3)
+    """
+    block: ArrayBlock
+    record: array
+    children: array
+    rotation: int
+
+    def __init__(self, block: ArrayBlock, rotation: int) -> None:
+        """Initialize this record of a change that is about to be made to
+        <block>, which is a rotation in direction <rotation> if <rotation> is
+        not 0.
+        """
+        nodes = block._board.nodes
+        start = block._record()
+        self.block = block
+        self.record = nodes[start:start + _STRIDE]
+        if self.record[_KIND] == _PARENT:
+            first = self.record[_CHILD] * _STRIDE
+            self.children = nodes[first:first + 4 * _STRIDE]
+        else:
+            self.children = array('i')
+        self.rotation = rotation
+
+    def undo(self) -> None:
+        """Restore <block> to what it was before the change.
+
+        Precondition: every change made to <block> and its descendants after
+        this one has already been undone.
+        """
+        if self.rotation != 0:
+            self.block.rotate(4 - self.rotation)
+            return
+        board = self.block._board
+        start = self.block._record()
+        if board.nodes[start + _KIND] == _PARENT and \
+                self.record[_KIND] == _LEAF:
+            # The change was a smash, whose new records are no longer needed.
+            board._release(board.nodes[start + _CHILD])
+        board.nodes[start:start + _STRIDE] = self.record
+        if self.record[_KIND] == _PARENT:
+            first = self.record[_CHILD]
+            if first in board._free:
+                # The change was a combine, which freed the children's
+                # records. They may have been reused since, so they are
+                # written back as well.
+                board._free.remove(first)
+            board.nodes[first * _STRIDE:(first + 4) * _STRIDE] = self.children
+
+
+def _same_subtree(board: ArrayBoard, node: int,
+                  other_board: ArrayBoard, other_node: int) -> bool:
+    """Return True iff the subtree at <node> in <board> has the same shape and
+    colours as the subtree at <other_node> in <other_board>.
+    """
+    pending = [(node, other_node)]
+    while pending:
+        a, b = pending.pop()
+        a_record = a * _STRIDE
+        b_record = b * _STRIDE
+        if board.nodes[a_record + _KIND] != other_board.nodes[b_record + _KIND]:
+            return False
+        if board.nodes[a_record + _KIND] == _LEAF:
+            if board.nodes[a_record + _COLOUR] != \
+                    other_board.nodes[b_record + _COLOUR]:
+                return False
+        else:
+            a_first = board.nodes[a_record + _CHILD]
+            b_first = other_board.nodes[b_record + _CHILD]
+            for i in range(4):
+                pending.append((a_first + i, b_first + i))
+    return True
+
+
+def _grid_hash(board: ArrayBoard, node: int, levels: int) -> int:
+    """Return the grid_hash of the subtree at <node> in <board>, whose root
+    could be subdivided <levels> more times.
+    """
+    record = node * _STRIDE
+    if board.nodes[record + _KIND] == _LEAF:
+        return _uniform_hash(COLOUR_LIST[board.nodes[record + _COLOUR]],
+                             levels)
+    first = board.nodes[record + _CHILD]
+    return hash((_grid_hash(board, first, levels - 1),
+                 _grid_hash(board, first + 1, levels - 1),
+                 _grid_hash(board, first + 2, levels - 1),
+                 _grid_hash(board, first + 3, levels - 1)))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'random', 'typing', '__future__', 'math',
+            'array', 'collections', 'block', 'settings'
+        ],
+        'max-attributes': 15,
+        'max-args': 6
+    })
+
+    import doctest
+    doctest.testmod()
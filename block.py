@@ -22,17 +22,23 @@ Misha Schwartz, and Jaisie Sin
 This file contains the Block class, the main data structure used in the game.
 """
 from __future__ import annotations
-from typing import Optional, Tuple, List
+from typing import Dict, Optional, Tuple, List, TYPE_CHECKING
 import random
 import math
 
 from settings import colour_name, COLOUR_LIST
 
+if TYPE_CHECKING:
+    from move_index import MoveIndex
 
-def generate_board(max_depth: int, size: int) -> Block:
+
+def generate_board(max_depth: int, size: int,
+                   rng: Optional[random.Random] = None) -> Block:
     """Return a new game board with a depth of <max_depth> and dimensions of
     <size> by <size>.
 
+    The board is drawn from <rng>, or from the random module if it is None.
+
     >>> board = generate_board(3, 750)
     >>> board.max_depth
     3
@@ -41,8 +47,10 @@ def generate_board(max_depth: int, size: int) -> Block:
     >>> len(board.children) == 4
     True
     """
-    board = Block((0, 0), size, random.choice(COLOUR_LIST), 0, max_depth)
-    board.smash()
+    if rng is None:
+        rng = random
+    board = Block((0, 0), size, rng.choice(COLOUR_LIST), 0, max_depth)
+    board.smash(rng=rng)
 
     return board
 
@@ -92,12 +100,56 @@ class Block:
         - its colour is not None.
     - level <= max_depth
     """
+    # === Private Attributes ===
+    # _parent:
+    #   The Block whose children include this Block, or None if this Block is
+    #   the root or has not been attached to its parent yet.
+    # _cache:
+    #   Values computed from this Block's subtree (e.g., its blob summaries),
+    #   keyed by what they are. They are forgotten whenever this Block or one
+    #   of its descendants changes.
+    # _lazy:
+    #   True iff this Block is laid out lazily (see set_lazy). A lazy Block
+    #   that has a parent derives its position from its parent's position and
+    #   its index among its parent's children, instead of storing it.
+    # _rotation:
+    #   The number of clockwise quarter turns that have been applied to this
+    #   lazy Block but not yet to the order of its children, nor to its
+    #   descendants. They are pushed down to its children whenever its
+    #   children are read.
+    # _position:
+    #   The stored position of this Block.
+    # _children:
+    #   The stored children of this Block, before any pending rotation.
+    # _index:
+    #   The MoveIndex kept for the board whose root is this Block, or None if
+    #   there is none (or this Block is not a root).
+    # _version:
+    #   The number of times that this Block has been the root of a tree in
+    #   which a Block changed, so that a value computed from the tree can be
+    #   told apart from one computed before the change.
+    #
+    # == Representation Invariants concerning the private attributes ==
+    #   - Every value in _cache describes the current subtree of this Block.
+    #   - If this Block has a value cached under some key, then so do all of
+    #     its descendants.
+    #   - 0 <= _rotation < 4
+    #   - If not _lazy, then _rotation == 0 and _position is this Block's
+    #     position.
     position: Tuple[int, int]
     size: int
     colour: Optional[Tuple[int, int, int]]
     level: int
     max_depth: int
     children: List[Block]
+    _parent: Optional[Block]
+    _cache: Dict[str, object]
+    _lazy: bool
+    _rotation: int
+    _position: Tuple[int, int]
+    _children: List[Block]
+    _index: Optional[MoveIndex]
+    _version: int
 
     def __init__(self, position: Tuple[int, int], size: int,
                  colour: Optional[Tuple[int, int, int]], level: int,
@@ -111,12 +163,121 @@ class Block:
             - level >= 0
             - max_depth >= level
         """
-        self.position = position
+        self._lazy = False
+        self._rotation = 0
+        self._parent = None
+        self._cache = {}
+        self._position = position
         self.size = size
         self.colour = colour
         self.level = level
         self.max_depth = max_depth
-        self.children = []
+        self._children = []
+        self._index = None
+        self._version = 0
+
+    @property
+    def position(self) -> Tuple[int, int]:
+        """The (x, y) coordinates of the upper left corner of this Block.
+        """
+        parent = self._parent
+        if self._lazy and parent is not None:
+            siblings = parent.children
+            for i in range(len(siblings)):
+                if siblings[i] is self:
+                    return parent._children_positions()[i]
+        return self._position
+
+    @position.setter
+    def position(self, position: Tuple[int, int]) -> None:
+        self._position = position
+
+    @property
+    def children(self) -> List[Block]:
+        """The blocks into which this block is subdivided.
+        """
+        if self._lazy:
+            self._settle()
+        return self._children
+
+    @children.setter
+    def children(self, children: List[Block]) -> None:
+        if self._lazy:
+            self._settle()
+        self._children = children
+        for child in children:
+            child._parent = self
+
+    def set_lazy(self, lazy: bool) -> None:
+        """Lay this Block and all its descendants out lazily iff <lazy>.
+
+        In lazy layout, swapping or rotating a Block takes constant time
+        instead of time proportional to the size of its subtree: positions are
+        derived from the path down to each Block when they are read, and
+        rotations are remembered and only applied to a Block's descendants
+        when they are read. Reading a position then takes O(depth ** 2) time.
+
+        Blocks created by smashing a lazy Block are lazy too.
+
+        >>> board = generate_board(3, 750)
+        >>> copy = board.create_copy()
+        >>> board.set_lazy(True)
+        >>> board.rotate(1) and copy.rotate(1)
+        True
+        >>> board == copy
+        True
+        """
+        if lazy:
+            pending = [self]
+            while len(pending) > 0:
+                block = pending.pop()
+                block._lazy = True
+                for child in block._children:
+                    child._parent = block
+                    pending.append(child)
+            return
+
+        pending = [(self, self.position)]
+        while len(pending) > 0:
+            block, position = pending.pop()
+            children = block.children
+            block._lazy = False
+            block.position = position
+            if len(children) == 4:
+                positions = block._children_positions()
+                for i in range(4):
+                    pending.append((children[i], positions[i]))
+
+    def _settle(self) -> None:
+        """Push the rotations pending on this Block and its ancestors down,
+        so that the stored order of this Block's children is their real order.
+        """
+        path = []
+        block = self
+        while block is not None:
+            path.append(block)
+            block = block._parent
+        # Pushing a rotation down may leave one pending on the next Block.
+        for block in reversed(path):
+            if block._rotation != 0:
+                block._push_rotation()
+
+    def _push_rotation(self) -> None:
+        """Apply the rotation pending on this Block to the order of its
+        children, and leave it pending on each of its children instead.
+
+        Precondition: no ancestor of this Block has a pending rotation.
+        """
+        turns = self._rotation
+        self._rotation = 0
+        children = self._children
+        if len(children) == 4:
+            children = children[turns:] + children[:turns]
+            self._children = children
+            for child in children:
+                if len(child._children) == 4:
+                    child._rotation = (child._rotation + turns) % 4
+                    child._cache.clear()
 
     def __str__(self) -> str:
         """Return this Block in a string format.
@@ -168,19 +329,57 @@ class Block:
 
             return True
 
+    def grid_hash(self) -> int:
+        """Return a hash of the unit cells of this Block.
+
+        Blocks with the same unit cells have the same hash, however they are
+        subdivided, so a leaf has the same hash as four children of its
+        colour. The hash does not depend on this Block's position, and is
+        cached like any other value computed from this Block's subtree, so
+        only the Blocks that changed since the last call are hashed again.
+
+        >>> leaf = Block((0, 0), 750, COLOUR_LIST[0], 0, 1)
+        >>> split = Block((0, 0), 750, None, 0, 1)
+        >>> split.children = [Block(position, 375, COLOUR_LIST[0], 1, 1)
+        ...                   for position in split._children_positions()]
+        >>> leaf.grid_hash() == split.grid_hash()
+        True
+        >>> split.children[0].paint(COLOUR_LIST[1])
+        True
+        >>> leaf.grid_hash() == split.grid_hash()
+        False
+        """
+        cached = self._cache_get('hash')
+        if cached is not None:
+            return cached
+
+        if len(self.children) == 0:
+            value = _uniform_hash(self.colour, self.max_depth - self.level)
+        else:
+            value = hash((self.children[0].grid_hash(),
+                          self.children[1].grid_hash(),
+                          self.children[2].grid_hash(),
+                          self.children[3].grid_hash()))
+        self._cache_put('hash', value)
+        return value
+
     def _child_size(self) -> int:
         """Return the size of this Block's children.
         """
         return round(self.size / 2.0)
 
-    def _children_positions(self) -> List[Tuple[int, int]]:
-        """Return the positions of this Block's four children.
+    def _children_positions(self, position: Optional[Tuple[int, int]] = None) \
+            -> List[Tuple[int, int]]:
+        """Return the positions of this Block's four children, if this Block
+        is at <position>, or at its own position if <position> is None.
 
         The positions are returned in this order: upper-right child, upper-left
         child, lower-left child, lower-right child.
         """
-        x = self.position[0]
-        y = self.position[1]
+        if position is None:
+            position = self.position
+        x = position[0]
+        y = position[1]
         size = self._child_size()
 
         return [(x + size, y), (x, y), (x, y + size), (x + size, y + size)]
@@ -191,13 +390,79 @@ class Block:
 
         <position> is the (x, y) coordinates of the upper-left corner of this
         Block.
+
+        The descendants of a lazy Block derive their positions from it, so
+        they are left alone.
         """
         self.position = position
-        if len(self.children) == 4:
+        if not self._lazy and len(self.children) == 4:
             positions = self._children_positions()
             for i in range(4):
                 self.children[i]._update_children_positions(positions[i])
 
+    def _invalidate(self) -> None:
+        """Forget the cached values of this Block and all its ancestors.
+
+        This must be called whenever this Block changes, since the values
+        cached by this Block and its ancestors describe its old state. The
+        version of the root of this Block's tree is increased.
+        """
+        block = self
+        while block._parent is not None:
+            block._cache.clear()
+            block = block._parent
+        block._cache.clear()
+        block._version += 1
+
+    def _update_index(self, removed: List[Block]) -> None:
+        """Report that this Block has changed, and that <removed> have been
+        removed from its children, to the MoveIndex of its board, if it has
+        one.
+
+        This must be called whenever this Block's colour or children change,
+        except by a swap or rotation.
+        """
+        root = self
+        while root._parent is not None:
+            root = root._parent
+        if root._index is not None:
+            root._index.update(self, removed)
+
+    def _record(self, journal: Optional[List[UndoRecord]],
+                rotation: int = 0) -> None:
+        """Append a record that undoes the change about to be made to this
+        Block to <journal>, if <journal> is not None.
+
+        The change is a rotation in direction <rotation> if <rotation> is not
+        0.
+        """
+        if journal is not None:
+            journal.append(UndoRecord(self, rotation))
+
+    def _cache_get(self, key: str) -> Optional[object]:
+        """Return the value cached for this Block under <key>, or None if
+        there is none.
+        """
+        if self._lazy:
+            # A rotation pending on an ancestor has not forgotten this
+            # Block's values yet.
+            self._settle()
+        return self._cache.get(key)
+
+    def _cache_put(self, key: str, value: object) -> None:
+        """Cache <value> for this Block under <key>, until this Block or one
+        of its descendants changes.
+
+        Precondition: every child of this Block already has a value cached
+        under <key>.
+        """
+        for child in self.children:
+            # Children attached by hand do not know their parent yet, and
+            # need to in order to invalidate this value when they change.
+            if child._parent is None:
+                child._parent = self
+        self._cache[key] = value
+
     def smashable(self) -> bool:
         """Return True iff this block can be smashed.
 
@@ -206,97 +471,141 @@ class Block:
         """
         return self.level < self.max_depth and len(self.children) == 0
 
-    def smash(self) -> bool:
+    def smash(self, journal: Optional[List[UndoRecord]] = None,
+              rng: Optional[random.Random] = None) -> bool:
         """Sub-divide this block so that it has four randomly generated
-        children.
+        children, drawn from <rng>, or from the random module if it is None.
 
         If this Block's level is <max_depth>, do nothing. If this block has
         children, do nothing.
 
+        If <journal> is given and the smash is performed, a record that undoes
+        it is appended to <journal>.
+
         Return True iff the smash was performed.
         """
         if self.smashable():
-            positions = self._children_positions()
-            size = self._child_size()
-            level = self.level + 1
-            for i in range(4):
-                colour = random.choice(COLOUR_LIST)
-                child = Block(positions[i], size, colour, level, self.max_depth)
-                self.children.append(child)
-            self.colour = None
-            for child in self.children:
-                rand = random.random()
-                if rand < math.exp(-0.25 * child.level):
-                    child.smash()
-                else:
-                    colour = random.choice(COLOUR_LIST)
-                    child.colour = colour
+            self._record(journal)
+            self._smash_subtree(random if rng is None else rng)
+            self._invalidate()
+            self._update_index([])
             return True
         return False
 
-    def swap(self, direction: int) -> bool:
+    def _smash_subtree(self, rng: random.Random) -> None:
+        """Give this leaf four children randomly generated from <rng>, and
+        randomly smash them in turn.
+
+        Precondition: self.smashable()
+        """
+        positions = self._children_positions()
+        size = self._child_size()
+        level = self.level + 1
+        for i in range(4):
+            colour = rng.choice(COLOUR_LIST)
+            child = Block(positions[i], size, colour, level, self.max_depth)
+            child._parent = self
+            child._lazy = self._lazy
+            self.children.append(child)
+        self.colour = None
+        for child in self.children:
+            rand = rng.random()
+            if rand < math.exp(-0.25 * child.level):
+                if child.smashable():
+                    child._smash_subtree(rng)
+            else:
+                colour = rng.choice(COLOUR_LIST)
+                child.colour = colour
+
+    def swap(self, direction: int,
+             journal: Optional[List[UndoRecord]] = None) -> bool:
         """Swap the child Blocks of this Block.
 
         If this Block has no children, do nothing. Otherwise, if <direction> is
         1, swap vertically. If <direction> is 0, swap horizontally.
 
+        If <journal> is given and the swap is performed, a record that undoes
+        it is appended to <journal>.
+
         Return True iff the swap was performed.
 
         Precondition: <direction> is either 0 or 1
         """
-        if len(self.children) == 4:
+        if len(self.children) == 4 and direction in (0, 1):
+            self._record(journal)
             if direction == 1:
                 new = [self.children[3], self.children[2], self.children[1],
                        self.children[0]]
-                self.children = new[:]
-                self._update_children_positions(self.position)
-                return True
-            elif direction == 0:
+            else:
                 new = [self.children[1], self.children[0], self.children[3],
                        self.children[2]]
-                self.children = new[:]
-                self._update_children_positions(self.position)
-                return True
+            self.children = new
+            self._update_children_positions(self.position)
+            self._invalidate()
+            return True
         return False
 
-    def rotate(self, direction: int) -> bool:
+    def rotate(self, direction: int,
+               journal: Optional[List[UndoRecord]] = None) -> bool:
         """Rotate this Block and all its descendants.
 
         If this Block has no children, do nothing. If <direction> is 1, rotate
         clockwise. If <direction> is 3, rotate counter-clockwise.
 
+        If <journal> is given and the rotate is performed, a record that undoes
+        it is appended to <journal>.
+
         Return True iff the rotate was performed.
 
         Precondition: <direction> is either 1 or 3.
         """
-        if len(self.children) == 4:
-            if direction == 1:
-                new = [self.children[1], self.children[2], self.children[3],
-                       self.children[0]]
-                self.children = new[:]
-                self._update_children_positions(self.position)
-                for child in self.children:
-                    child.rotate(direction)
-                return True
-            elif direction == 3:
-                new = [self.children[3], self.children[0], self.children[1],
-                       self.children[2]]
-                self.children = new[:]
+        if len(self.children) == 4 and direction in (1, 3):
+            self._record(journal, direction)
+            if self._lazy:
+                self._rotation = (self._rotation + direction) % 4
+            else:
+                self._rotate_children(direction)
                 self._update_children_positions(self.position)
-                for child in self.children:
-                    child.rotate(direction)
-                return True
+            self._invalidate()
+            return True
         return False
 
-    def paint(self, colour: Tuple[int, int, int]) -> bool:
+    def _rotate_children(self, direction: int) -> None:
+        """Reorder the children of this Block and of all its descendants to
+        rotate them in <direction>, forgetting their cached values.
+
+        Positions are not updated.
+
+        Precondition: <direction> is either 1 or 3.
+        """
+        if direction == 1:
+            new = [self.children[1], self.children[2], self.children[3],
+                   self.children[0]]
+        else:
+            new = [self.children[3], self.children[0], self.children[1],
+                   self.children[2]]
+        self.children = new
+        self._cache.clear()
+        for child in self.children:
+            if len(child.children) == 4:
+                child._rotate_children(direction)
+
+    def paint(self, colour: Tuple[int, int, int],
+              journal: Optional[List[UndoRecord]] = None) -> bool:
         """Change this Block's colour iff it is a leaf at a level of max_depth
         and its colour is different from <colour>.
 
+        If <journal> is given and the colour is changed, a record that undoes
+        it is appended to <journal>.
+
         Return True iff this Block's colour was changed.
         """
         if len(self.children) == 0 and self.level == self.max_depth and \
                 self.colour != colour:
+            self._record(journal)
             self.colour = colour
+            self._invalidate()
+            self._update_index([])
             return True
         return False
 
@@ -333,7 +642,7 @@ class Block:
         else:
             return 'None'
 
-    def combine(self) -> bool:
+    def combine(self, journal: Optional[List[UndoRecord]] = None) -> bool:
         """Turn this Block into a leaf based on the majority colour of its
         children.
 
@@ -344,13 +653,20 @@ class Block:
         If there is no majority colour, do nothing. If this block is not at a
         level of max_depth - 1, or this block has no children, do nothing.
 
+        If <journal> is given and the combine is performed, a record that
+        undoes it, including the removed children, is appended to <journal>.
+
         Return True iff this Block was turned into a leaf node.
         """
         if self.level == self.max_depth - 1 and len(self.children) == 4:
             majority_colour = self._majority_colour()
             if majority_colour != 'None':
+                self._record(journal)
+                removed = self.children
                 self.colour = majority_colour
                 self.children = []
+                self._invalidate()
+                self._update_index(removed)
                 return True
         return False
 
@@ -359,24 +675,232 @@ class Block:
 
         Remember that a deep copy has new blocks (not aliases) at every level.
         """
-        b = Block(self.position, self.size, self.colour, self.level,
+        return self._copy_at(self.position)
+
+    def _copy_at(self, position: Tuple[int, int]) -> Block:
+        """Return a new Block that is a deep copy of this Block, at
+        <position>.
+        """
+        b = Block(position, self.size, self.colour, self.level,
                   self.max_depth)
+        b._lazy = self._lazy
+        # Cached values are never mutated, so the copy can share them.
+        b._cache = self._cache.copy()
         if len(self.children) == 0:
             return b
         else:
+            positions = b._children_positions()
             children = []
-            for child in self.children:
-                children.append(child.create_copy())
+            for i in range(4):
+                c = self.children[i]._copy_at(positions[i])
+                c._parent = b
+                children.append(c)
             b.children = children
             return b
 
+    def path_copy(self, target: Block, subtree: bool = False) \
+            -> Tuple[Block, Block]:
+        """Return a copy of this Block that shares its subtrees with this
+        Block, except for the Blocks on the path down to <target>, together
+        with the copy of <target>.
+
+        Only the Blocks on the path are new, so the copy takes O(depth) new
+        Blocks rather than a new Block for every Block in the tree. The
+        shared subtrees belong to this Block, so the copy of <target> is the
+        only part of the copy that may be changed.
+
+        Swapping or rotating a Block moves all its descendants, which would
+        change the shared subtrees. If <subtree> is True, the whole subtree of
+        <target> is copied as well, so that its copy can be swapped or
+        rotated.
+
+        Precondition: <target> is this Block or one of its descendants.
+        """
+        if subtree and target is self:
+            root = self.create_copy()
+            return root, root
+
+        root = self._shallow_copy()
+        node = self
+        copy = root
+        for i in self._path_to(target):
+            child = node.children[i]
+            if subtree and child is target:
+                child_copy = child.create_copy()
+            else:
+                child_copy = child._shallow_copy()
+            child_copy._parent = copy
+            copy.children[i] = child_copy
+            node = child
+            copy = child_copy
+        return root, copy
+
+    def _path_to(self, block: Block) -> List[int]:
+        """Return the index of each child on the way from this Block down to
+        <block>.
+
+        Unlike a position and a level, the path always identifies a single
+        Block: when sizes are rounded, a Block's corner can lie outside the
+        ancestor it belongs to.
+
+        Precondition: <block> is this Block or one of its descendants.
+        """
+        path = []
+        node = block
+        while node is not self and node._parent is not None:
+            siblings = node._parent.children
+            i = 0
+            while siblings[i] is not node:
+                i += 1
+            path.append(i)
+            node = node._parent
+        if node is self:
+            path.reverse()
+            return path
+
+        # Children attached by hand do not know their parent, so <block> is
+        # searched for from this Block instead.
+        pending = []
+        node, path = self, []
+        while node is not block:
+            for i in range(len(node.children)):
+                pending.append((node.children[i], path + [i]))
+            node, path = pending.pop()
+        return path
+
+    def _follow(self, path: List[int]) -> Block:
+        """Return the Block reached from this Block by taking the child at
+        each index in <path> in turn.
+        """
+        block = self
+        for i in path:
+            block = block.children[i]
+        return block
+
+    def _shallow_copy(self) -> Block:
+        """Return a new Block with the same attributes as this Block, whose
+        children are the children of this Block rather than copies of them.
+        """
+        b = Block(self.position, self.size, self.colour, self.level,
+                  self.max_depth)
+        b._lazy = self._lazy
+        b._cache = self._cache.copy()
+        # The children still belong to this Block: if they were attached by
+        # hand, they must learn so now, or the copy would adopt them when it
+        # caches a value (see _cache_put).
+        for child in self.children:
+            if child._parent is None:
+                child._parent = self
+        b._children = self.children[:]
+        return b
+
+
+# The hash of every uniform grid of unit cells hashed so far, by its colour and
+# the number of times it can be subdivided.
+_UNIFORM_HASHES: Dict[Tuple[Tuple[int, int, int], int], int] = {}
+
+
+def _uniform_hash(colour: Tuple[int, int, int], levels: int) -> int:
+    """Return the grid_hash of a Block of <colour> that could be subdivided
+    <levels> more times.
+
+    It is the hash of four such Blocks that could be subdivided one time
+    fewer, so that subdividing a Block does not change its hash. Hashing
+    tuples of ints does not depend on the process, so every process gives the
+    same hashes.
+    """
+    key = (colour, levels)
+    value = _UNIFORM_HASHES.get(key)
+    if value is None:
+        if levels == 0:
+            value = hash(colour)
+        else:
+            quarter = _uniform_hash(colour, levels - 1)
+            value = hash((quarter, quarter, quarter, quarter))
+        _UNIFORM_HASHES[key] = value
+    return value
+
+
+class UndoRecord:
+    """A record of one change made to a Block, which can undo that change.
+
+    === Public Attributes ===
+    block:
+        The Block that was changed.
+    colour:
+        The colour of <block> before the change.
+    children:
+        The children of <block> before the change.
+    rotation:
+        The direction in which <block> was rotated, or 0 if the change was not
+        a rotation.
+
+    === Representation Invariants ===
+    - rotation in (0, 1, 3)
+    """
+    block: Block
+    colour: Optional[Tuple[int, int, int]]
+    children: List[Block]
+    rotation: int
+
+    def __init__(self, block: Block, rotation: int) -> None:
+        """Initialize this record of a change that is about to be made to
+        <block>, which is a rotation in direction <rotation> if <rotation> is
+        not 0.
+        """
+        self.block = block
+        self.colour = block.colour
+        self.children = block.children[:]
+        self.rotation = rotation
+
+    def undo(self) -> None:
+        """Restore <block> to what it was before the change.
+
+        Precondition: every change made to <block> and its descendants after
+        this one has already been undone.
+        """
+        if self.rotation != 0:
+            self.block.rotate(4 - self.rotation)
+        else:
+            old_colour = self.block.colour
+            old_children = self.block.children
+            self.block.colour = self.colour
+            self.block.children = self.children[:]
+            self.block._update_children_positions(self.block.position)
+            self.block._invalidate()
+            # Undoing a swap puts back the same children, which does not
+            # change the MoveIndex.
+            removed = [c for c in old_children
+                       if not any(c is child for child in self.children)]
+            if old_colour != self.colour or len(removed) > 0 or \
+                    len(old_children) != len(self.children):
+                self.block._update_index(removed)
+
+
+def undo(journal: List[UndoRecord], mark: int = 0) -> None:
+    """Undo the changes recorded in <journal> after its first <mark> records,
+    most recent first, and remove their records from <journal>.
+
+    >>> board = Block((0, 0), 750, COLOUR_LIST[0], 0, 1)
+    >>> journal = []
+    >>> board.smash(journal)
+    True
+    >>> undo(journal)
+    >>> board == Block((0, 0), 750, COLOUR_LIST[0], 0, 1)
+    True
+    >>> journal
+    []
+    """
+    while len(journal) > mark:
+        journal.pop().undo()
+
 
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
             'doctest', 'python_ta', 'random', 'typing', '__future__', 'math',
-            'settings'
+            'settings', 'move_index'
         ],
         'max-attributes': 15,
         'max-args': 6
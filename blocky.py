@@ -23,16 +23,28 @@ This file contains the different game states for the Blocky game.
 """
 
 from __future__ import annotations
-from typing import Dict, List, Optional, Tuple
-import pygame
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import random
 
 from actions import ACTION_MESSAGE, ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE,\
     SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE, ACTION_PENALTY
 from block import Block
+from board_layer import BoardLayer
+from goal import TranspositionTable, _flatten
 from player import Player
-from renderer import Renderer
 from settings import ANIMATION_DURATION
 
+# How often, in milliseconds, a game waiting for a player who is choosing a
+# move in the background checks whether the move is ready.
+_THINKING_POLL = 50
+
+# pygame and the Renderer are only needed to play on screen, so GameData can
+# be used to play games without a display (see headless.py).
+if TYPE_CHECKING:
+    import pygame
+    from renderer import Renderer
+    from replay import MoveLog
+
 
 def _block_to_squares(board: Block) -> List[Tuple[Tuple[int, int, int],
                                                   Tuple[int, int], int]]:
@@ -49,12 +61,18 @@ def _block_to_squares(board: Block) -> List[Tuple[Tuple[int, int, int],
     The order of the squares does not matter.
     """
     lst = []
-    if len(board.children) == 0:
-        return [(board.colour, board.position, board.size)]
-    else:
-        for child in board.children:
-            lst.extend(_block_to_squares(child))
-        return lst
+    # Positions are passed down rather than read from each Block, since a
+    # lazily laid out Block derives its position from the path down to it.
+    pending = [(board, board.position)]
+    while len(pending) > 0:
+        block, position = pending.pop()
+        if len(block.children) == 0:
+            lst.append((block.colour, position, block.size))
+        else:
+            positions = block._children_positions(position)
+            for i in range(4):
+                pending.append((block.children[i], positions[i]))
+    return lst
 
 
 class GameData:
@@ -74,20 +92,51 @@ class GameData:
         The number of combines done by each player.
     paints:
         The number of paints done by each player.
+    verify_scores:
+        If True, every score returned by calculate_score is checked against a
+        score computed from scratch.
+    rng:
+        The random number generator that the seed of each smash is drawn
+        from, or None if it is drawn from the random module.
+    log:
+        The log that every successful move is written to, or None if the
+        moves are not logged.
+    table:
+        The scores of the goals that cannot be scored by region on the
+        boards reached so far, so that a board reached again is not scored
+        again.
 
     === Representation Invariants ===
     - len(players) >= 1
     """
+    # === Private Attributes ===
+    # _goal_scores:
+    #   The current score of each player's goal on the board, without
+    #   penalties. It is kept up to date by update_scores.
+    # _squares:
+    #   The squares to draw the board with, or None if they have not been
+    #   worked out yet.
+    # _squares_version:
+    #   The version of the board that _squares were worked out for.
     max_turns: int
     board: Block
     players: List[Player]
     smashes: Dict[int, int]
     combines: Dict[int, int]
     paints: Dict[int, int]
-
-    def __init__(self, board: Block, players: List[Player]) -> None:
-        """Initialize the game data, saving a reference to <board> and
-        <players>.
+    verify_scores: bool
+    rng: Optional[random.Random]
+    log: Optional[MoveLog]
+    table: TranspositionTable
+    _goal_scores: Dict[int, int]
+    _squares: Optional[List[Tuple[Tuple[int, int, int], Tuple[int, int],
+                                  int]]]
+    _squares_version: int
+
+    def __init__(self, board: Block, players: List[Player],
+                 rng: Optional[random.Random] = None) -> None:
+        """Initialize the game data, saving a reference to <board>, <players>
+        and the <rng> that smashes draw from.
 
         Precondition:
             - len(players) >= 1
@@ -100,18 +149,79 @@ class GameData:
         self.combines = {}
         self.paints = {}
 
+        self.verify_scores = False
+        self.rng = rng
+        self.log = None
+        self.table = TranspositionTable()
+        self._goal_scores = {}
+        self._squares = None
+        self._squares_version = 0
+
         # Start off all counts at 0
         for player in players:
             self.smashes[player.id] = 0
             self.combines[player.id] = 0
             self.paints[player.id] = 0
+            self._goal_scores[player.id] = self.table.score(player.goal,
+                                                            board)
+
+    def squares(self) -> List[Tuple[Tuple[int, int, int], Tuple[int, int],
+                                    int]]:
+        """Return the squares to draw the board with, as returned by
+        _block_to_squares.
+
+        The squares are only worked out again once the board has changed, so
+        they must not be mutated.
+        """
+        if self._squares is None or \
+                self._squares_version != self.board._version:
+            self._squares = _block_to_squares(self.board)
+            self._squares_version = self.board._version
+        return self._squares
+
+    def region_scores(self, block: Block) -> Dict[int, Optional[int]]:
+        """Return the part of each player's goal score that comes from the
+        unit cells within <block>, by player ID.
+
+        This must be called before a move changes <block>, and its result
+        passed to update_scores after the move.
+        """
+        scores = {}
+        for player in self.players:
+            scores[player.id] = player.goal.region_score(self.board, block)
+        return scores
+
+    def update_scores(self, block: Block,
+                      before: Dict[int, Optional[int]]) -> None:
+        """Update each player's goal score after a move that changed only
+        <block>, where <before> is what region_scores returned for <block>
+        before the move.
+
+        Goals that can be scored by region are updated by the change within
+        <block>. The others are looked up in <self.table>, or scored again if
+        the board has not been reached before, which only revisits the blocks
+        that changed since their scores are built from cached values.
+        """
+        for player in self.players:
+            if before[player.id] is None:
+                score = self.table.score(player.goal, self.board)
+            else:
+                score = self._goal_scores[player.id] - before[player.id] + \
+                    player.goal.region_score(self.board, block)
+            self._goal_scores[player.id] = score
 
     def calculate_score(self, player_id: int) -> Tuple[int, int]:
         """Return a tuple containing first the <player_id>'s score based on
         their goal in the game and second the deductions from their score based
         on the actions they've taken.
         """
-        goal_score = self.players[player_id].goal.score(self.board)
+        goal_score = self._goal_scores[player_id]
+        if self.verify_scores:
+            goal = self.players[player_id].goal
+            expected = goal.cell_score(_flatten(self.board))
+            assert goal_score == expected, \
+                f'Player {player_id} has a score of {goal_score}, ' \
+                f'but should have {expected}'
 
         penalty = self.smashes[player_id] * ACTION_PENALTY[SMASH] + \
                   self.combines[player_id] * ACTION_PENALTY[COMBINE] + \
@@ -119,6 +229,66 @@ class GameData:
 
         return goal_score, penalty
 
+    def apply_move(self, player: Player,
+                   move: Tuple[str, Optional[int], Block],
+                   seed: Optional[int] = None) -> bool:
+        """Attempt to do <move> on the board for <player>, keeping the count
+        of their penalised actions and every player's goal score up to date.
+
+        A smash draws the new children from a random number generator seeded
+        with <seed>, or with a seed drawn from <self.rng> if it is None, so
+        that the smash can be done again from its seed alone.
+
+        Return True iff the move was successful.
+        """
+        action = (move[0], move[1])
+        direction = move[1]
+        block = move[2]
+        move_successful = False
+
+        if action != PASS:
+            before = self.region_scores(block)
+
+        if action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE]:
+            move_successful = block.rotate(direction)
+        elif action in [SWAP_HORIZONTAL, SWAP_VERTICAL]:
+            move_successful = block.swap(direction)
+        elif action == SMASH:
+            if seed is None:
+                source = random if self.rng is None else self.rng
+                seed = source.getrandbits(32)
+            move_successful = block.smash(rng=random.Random(seed))
+            self.smashes[player.id] += int(move_successful)
+        elif action == PAINT:
+            move_successful = block.paint(player.goal.colour)
+            self.paints[player.id] += int(move_successful)
+        elif action == COMBINE:
+            move_successful = block.combine()
+            self.combines[player.id] += int(move_successful)
+        elif action == PASS:
+            # Do nothing
+            move_successful = True
+
+        if move_successful and action != PASS:
+            self.update_scores(block, before)
+        if move_successful and self.log is not None:
+            self.log.record_move(self, player, move,
+                                 seed if action == SMASH else None)
+
+        return move_successful
+
+    def final_scores(self) -> Tuple[List[Tuple[int, int, int]], int]:
+        """Return a list of tuples containing each player ID, goal score, and
+        penalty, together with the ID of the winning player.
+        """
+        scores = []
+        for p in self.players:
+            goal_score, penalty = self.calculate_score(p.id)
+            scores.append((p.id, goal_score, penalty))
+
+        winner = max(scores, key=lambda item: item[1] - item[2])[0]
+        return scores, winner
+
 
 class GameState:
     """One of the different states that a Blocky game can be in.
@@ -141,6 +311,26 @@ class GameState:
         """
         raise NotImplementedError
 
+    def render_key(self) -> Optional[Tuple]:
+        """Return a value that only changes when what this GameState renders
+        changes, so that the screen is not rendered again while it is the
+        same, or None if this GameState must be rendered on every frame.
+        """
+        return None
+
+    def idle_timeout(self) -> Optional[int]:
+        """Return the number of milliseconds that this GameState can wait
+        for an event once an update has changed nothing, before it must be
+        updated again, or None if only an event can change it.
+        """
+        return 0
+
+    def close(self) -> None:
+        """Stop anything this GameState is doing in the background, since the
+        game is being closed.
+        """
+        return
+
 
 class MainState(GameState):
     """A GameState that manages the moves made by different players in Blocky.
@@ -154,10 +344,13 @@ class MainState(GameState):
     #   The index of the current player in GameData.players.
     # _current_score:
     #   The score of the current player, including penalties.
+    # _layer:
+    #   The picture of the board, drawn again only where moves change it.
     _turn: int
     _data: GameData
     _current_player_index: int
     _current_score: int
+    _layer: BoardLayer
 
     def __init__(self, data: GameData) -> None:
         """Initialize this GameState.
@@ -165,6 +358,7 @@ class MainState(GameState):
         self._turn = 0
         self._data = data
         self._current_player_index = 0
+        self._layer = BoardLayer()
 
         score, penalty = self._data.calculate_score(self._current_player().id)
         self._current_score = score - penalty
@@ -189,28 +383,7 @@ class MainState(GameState):
     def _do_move(self, move: Tuple[str, Optional[int], Block]) -> bool:
         """Attempt to do the player's requested move.
         """
-        action = (move[0], move[1])
-        direction = move[1]
-        block = move[2]
-        player = self._current_player()
-        move_successful = False
-
-        if action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE]:
-            move_successful = block.rotate(direction)
-        elif action in [SWAP_HORIZONTAL, SWAP_VERTICAL]:
-            move_successful = block.swap(direction)
-        elif action == SMASH:
-            move_successful = block.smash()
-            self._data.smashes[player.id] += int(move_successful)
-        elif action == PAINT:
-            move_successful = block.paint(self._current_player().goal.colour)
-            self._data.paints[player.id] += int(move_successful)
-        elif action == COMBINE:
-            move_successful = block.combine()
-            self._data.combines[player.id] += int(move_successful)
-        elif action == PASS:
-            # Do nothing
-            move_successful = True
+        move_successful = self._data.apply_move(self._current_player(), move)
 
         if move_successful:
             self._update_player()
@@ -241,12 +414,13 @@ class MainState(GameState):
             return self
         else:
             # Save what the board looks like before the move
-            background = _block_to_squares(self._data.board)
+            background = self._data.squares()
             # Also save the current player ID
             player_id = self._current_player().id
 
             # Do the move
             if self._do_move(move):
+                self._layer.mark_dirty(move[2])
                 # Animate the move that was just done
                 return AnimateMoveState(self, player_id, move, background)
             else:
@@ -256,7 +430,7 @@ class MainState(GameState):
     def render(self, renderer: Renderer) -> None:
         """Render the current state of the game onto the screen.
         """
-        renderer.draw_board(_block_to_squares(self._data.board))
+        self._layer.draw(renderer, self._data.board, self._data.squares())
 
         b = self._current_player().get_selected_block(self._data.board)
         if b is not None:
@@ -265,8 +439,47 @@ class MainState(GameState):
         p = self._current_player()
         status = f'Turn {self._turn} | Player {p.id} | ' \
                  f'Score {self._current_score} | {p.goal.description()}'
+        if p.thinking():
+            status += ' | Thinking...'
         renderer.draw_status(status)
 
+    def render_key(self) -> Optional[Tuple]:
+        """Return a value that only changes when the board, the turn, the
+        current player, the block they have selected or whether they are
+        thinking changes.
+        """
+        p = self._current_player()
+        b = p.get_selected_block(self._data.board)
+        selected = None if b is None else (b.position, b.size)
+        return (self._data.board._version, self._turn,
+                self._current_player_index, selected, p.thinking())
+
+    def idle_timeout(self) -> Optional[int]:
+        """Return None, since players only move in response to events, or 0
+        once the game is over.
+
+        While the current player is choosing a move in the background, return
+        how often to check whether it is ready.
+        """
+        if self._turn >= self._data.max_turns:
+            return 0
+        if self._current_player().thinking():
+            return _THINKING_POLL
+        return None
+
+    def close(self) -> None:
+        """Stop every player who is choosing a move in the background.
+        """
+        for player in self._data.players:
+            player.cancel()
+
+
+def _get_ticks() -> int:
+    """Return the number of milliseconds since pygame.init() was called.
+    """
+    import pygame
+    return pygame.time.get_ticks()
+
 
 class AnimateMoveState(GameState):
     """A GameState that animates a move made by a player before returning to its
@@ -299,7 +512,7 @@ class AnimateMoveState(GameState):
         self._player_id = player_id
         self._move = move
         self._background = background
-        self._start_time = pygame.time.get_ticks()
+        self._start_time = _get_ticks()
 
     def process_event(self, event: pygame.event.Event) -> None:
         """Process the event from the operating system. In this case we
@@ -315,7 +528,7 @@ class AnimateMoveState(GameState):
         The returned GameState will be self if the animation is still
         running.
         """
-        elapsed_seconds = (pygame.time.get_ticks() - self._start_time) / 1000
+        elapsed_seconds = (_get_ticks() - self._start_time) / 1000
 
         if elapsed_seconds > ANIMATION_DURATION:
             # The animation is complete, do the move, go back to the last
@@ -346,6 +559,24 @@ class AnimateMoveState(GameState):
         status = f'Player {self._player_id} is {ACTION_MESSAGE[action]}'
         renderer.draw_status(status)
 
+    def render_key(self) -> Optional[Tuple]:
+        """Return an empty tuple, since the animation does not change while
+        it runs.
+        """
+        return ()
+
+    def idle_timeout(self) -> Optional[int]:
+        """Return the number of milliseconds left until the animation is
+        complete.
+        """
+        elapsed = _get_ticks() - self._start_time
+        return max(0, int(ANIMATION_DURATION * 1000) - elapsed + 1)
+
+    def close(self) -> None:
+        """Close the GameState that this animation returns to.
+        """
+        self._parent.close()
+
 
 class GameOverState(GameState):
     """A GameState that is displayed when the game is over.
@@ -359,14 +590,12 @@ class GameOverState(GameState):
     _winner: int
 
     def __init__(self, data: GameData) -> None:
-        """Initialize this GameState.
+        """Initialize this GameState, and finish the log of the game in
+        <data>, if it has one.
         """
-        self._scores = []
-        for p in data.players:
-            goal_score, penalty = data.calculate_score(p.id)
-            self._scores.append((p.id, goal_score, penalty))
-
-        self._winner = max(self._scores, key=lambda item: item[1] - item[2])[0]
+        self._scores, self._winner = data.final_scores()
+        if data.log is not None:
+            data.log.finish(data)
 
     def process_event(self, event: pygame.event.Event) -> None:
         """Process the event from the operating system. In this case we
@@ -401,6 +630,16 @@ class GameOverState(GameState):
 
         renderer.print(f'Player {self._winner} wins!', x, y)
 
+    def render_key(self) -> Optional[Tuple]:
+        """Return an empty tuple, since the final scores never change.
+        """
+        return ()
+
+    def idle_timeout(self) -> Optional[int]:
+        """Return None, since the game is over.
+        """
+        return None
+
 
 if __name__ == '__main__':
     import python_ta
@@ -409,7 +648,9 @@ if __name__ == '__main__':
         'allowed-io': ['run_game'],
         'allowed-import-modules': [
             'doctest', 'python_ta', 'random', 'typing', 'pygame', '__future__',
-            'block', 'player', 'renderer', 'settings', 'actions'
+            'block', 'board_layer', 'goal', 'player', 'renderer', 'replay',
+            'settings', 'actions'
         ],
+        'max-attributes': 13,
         'generated-members': 'pygame.*'
     })
@@ -0,0 +1,148 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains the BoardLayer class, which keeps a picture of the board
+off screen so that it does not have to be drawn again every frame.
+
+The picture is what the Renderer draws for the board, copied from the screen.
+When the board changes, only the rectangles touched by the moves since the
+last frame are cleared and drawn again, with the screen clipped to each of
+them, and copied back into the picture. A frame in which the board did not
+change only copies the picture onto the screen.
+"""
+from __future__ import annotations
+from typing import List, Optional, Tuple, TYPE_CHECKING
+
+from block import Block
+
+# pygame is only needed to play on screen, so it is imported when it is used.
+if TYPE_CHECKING:
+    import pygame
+    from renderer import Renderer
+
+
+def _reach(block: Block) -> int:
+    """Return how far from its top left corner <block> and its descendants
+    can be drawn, across or down.
+
+    Since sizes are rounded, a Block's descendants can reach a pixel past it
+    for every level below it.
+    """
+    return block.size + block.max_depth - block.level
+
+
+def _squares_within(board: Block, area: Tuple[int, int, int, int]) -> \
+        List[Tuple[Tuple[int, int, int], Tuple[int, int], int]]:
+    """Return the squares of <board>, in the format and order of
+    blocky._block_to_squares, leaving out those of Blocks that cannot overlap
+    <area>, which is given as (x, y, width, height).
+    """
+    x, y, width, height = area
+    lst = []
+    pending = [(board, board.position)]
+    while len(pending) > 0:
+        block, position = pending.pop()
+        reach = _reach(block)
+        if position[0] >= x + width or position[0] + reach <= x or \
+                position[1] >= y + height or position[1] + reach <= y:
+            continue
+        if len(block.children) == 0:
+            lst.append((block.colour, position, block.size))
+        else:
+            positions = block._children_positions(position)
+            for i in range(4):
+                pending.append((block.children[i], positions[i]))
+    return lst
+
+
+class BoardLayer:
+    """A picture of the board, kept off screen and drawn again only where the
+    board has changed.
+    """
+    # === Private Attributes ===
+    # _surface:
+    #   The picture of the board, or None if it has not been drawn yet.
+    # _version:
+    #   The version of the board in the picture.
+    # _dirty:
+    #   The rectangles of the screen, as (x, y, width, height), that have
+    #   changed since the picture was drawn. If the board has changed but
+    #   there are none, the whole picture is drawn again.
+    _surface: Optional[pygame.Surface]
+    _version: int
+    _dirty: List[Tuple[int, int, int, int]]
+
+    def __init__(self) -> None:
+        """Initialize a layer with no picture yet.
+        """
+        self._surface = None
+        self._version = 0
+        self._dirty = []
+
+    def mark_dirty(self, block: Block) -> None:
+        """Record that <block> has changed, so that its rectangle is drawn
+        again in the next frame.
+        """
+        x, y = block.position
+        self._dirty.append((x, y, _reach(block), _reach(block)))
+
+    def draw(self, renderer: Renderer, board: Block,
+             squares: List[Tuple[Tuple[int, int, int], Tuple[int, int],
+                                 int]]) -> None:
+        """Draw <board>, whose squares are <squares>, onto the screen with
+        <renderer>, drawing again only what changed since the last call.
+        """
+        import pygame
+
+        screen = pygame.display.get_surface()
+        area = pygame.Rect(board.position, (_reach(board), _reach(board)))
+        area = area.clip(screen.get_rect())
+
+        if self._surface is None or self._surface.get_size() != area.size or \
+                (board._version != self._version and len(self._dirty) == 0):
+            renderer.draw_board(squares)
+            self._surface = pygame.Surface(area.size)
+        else:
+            screen.blit(self._surface, area.topleft)
+            if board._version == self._version:
+                return
+            for rect in self._dirty:
+                # Overflow pixels that no square covers any more must be
+                # cleared as well.
+                screen.set_clip(pygame.Rect(rect))
+                renderer.clear()
+                renderer.draw_board(_squares_within(board, rect))
+            screen.set_clip(None)
+
+        self._surface.blit(screen, (0, 0), area)
+        self._version = board._version
+        self._dirty = []
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'pygame', 'block',
+            'renderer'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,183 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains a compact binary encoding of boards, used to send boards
+between processes and to store them.
+
+An encoded board is a header followed by two packed streams:
+- one bit for every Block above max_depth, in pre-order, which is 1 iff the
+  Block is split into four children (Blocks at max_depth are always leaves,
+  so they have no bit), and
+- the index in COLOUR_LIST of the colour of every leaf, in pre-order.
+
+Bits are packed from the least significant bit of each byte up. The header
+holds the format version, max_depth, the number of bits used for each colour
+index, the size of the board, and the length of each stream.
+"""
+from __future__ import annotations
+from typing import List, Union
+import struct
+
+from block import Block
+from settings import COLOUR_LIST
+
+# The header of an encoded board: magic number, format version, max_depth,
+# bits per colour index, size, number of split bits and number of leaves.
+_HEADER = struct.Struct('<4sBBBxIII')
+_MAGIC = b'BLKY'
+_VERSION = 1
+
+# The number of bits used for each colour index. It divides 8, so that no
+# colour index is split across two bytes.
+_COLOUR_BITS = 1
+while 1 << _COLOUR_BITS < len(COLOUR_LIST):
+    _COLOUR_BITS *= 2
+
+_DIGITS = '0123456789abcdef'
+
+
+def encode(board: Block) -> bytes:
+    """Return the encoding of <board>.
+
+    The position of <board> is not encoded: it is decoded at (0, 0).
+
+    >>> board = Block((0, 0), 750, COLOUR_LIST[0], 0, 1)
+    >>> board.smash()
+    True
+    >>> decode(encode(board)) == board
+    True
+    """
+    max_depth = board.max_depth
+    colour_indices = {colour: i for i, colour in enumerate(COLOUR_LIST)}
+    splits = []
+    colours = []
+    pending = [board]
+    while len(pending) > 0:
+        block = pending.pop()
+        children = block.children
+        if len(children) == 4:
+            splits.append('1')
+            pending.append(children[3])
+            pending.append(children[2])
+            pending.append(children[1])
+            pending.append(children[0])
+        else:
+            if block.level < max_depth:
+                splits.append('0')
+            colours.append(_DIGITS[colour_indices[block.colour]])
+
+    header = _HEADER.pack(_MAGIC, _VERSION, max_depth, _COLOUR_BITS,
+                          board.size, len(splits), len(colours))
+    # Reading the digits of a number from the least significant end puts the
+    # first split (or colour) in the lowest bits of the first byte.
+    split_bytes = _pack(splits, 2, len(splits))
+    colour_bytes = _pack(colours, 1 << _COLOUR_BITS,
+                         len(colours) * _COLOUR_BITS)
+    return header + split_bytes + colour_bytes
+
+
+def _pack(digits: List[str], base: int, num_bits: int) -> bytes:
+    """Return <digits>, which are digits in <base>, packed into bytes with the
+    first digit in the lowest bits, using <num_bits> bits in total.
+    """
+    if len(digits) == 0:
+        return b''
+    digits.reverse()
+    return int(''.join(digits), base).to_bytes((num_bits + 7) // 8, 'little')
+
+
+def decode(data: Union[bytes, bytearray, memoryview]) -> Block:
+    """Return the board encoded in <data>, at position (0, 0).
+
+    <data> is read in place: it is not copied, even if it is a slice of a
+    larger buffer.
+
+    Raise a ValueError if <data> is not an encoded board.
+    """
+    view = memoryview(data)
+    if len(view) < _HEADER.size:
+        raise ValueError('The data is too short to be an encoded board.')
+    magic, version, max_depth, colour_bits, size, num_splits, num_leaves = \
+        _HEADER.unpack_from(view)
+    if magic != _MAGIC or version != _VERSION or \
+            colour_bits not in (1, 2, 4, 8):
+        raise ValueError('The data is not an encoded board.')
+    split_offset = _HEADER.size
+    colour_offset = split_offset + (num_splits + 7) // 8
+    if len(view) < colour_offset + (num_leaves * colour_bits + 7) // 8:
+        raise ValueError('The data is too short for the board it encodes.')
+
+    mask = (1 << colour_bits) - 1
+    split_index = 0
+    leaf_index = 0
+    board = Block((0, 0), size, None, 0, max_depth)
+    pending = [board]
+    while len(pending) > 0:
+        block = pending.pop()
+        split = 0
+        if block.level < max_depth:
+            if split_index == num_splits:
+                raise ValueError('The board has more Blocks than encoded.')
+            split = view[split_offset + (split_index >> 3)] >> \
+                (split_index & 7) & 1
+            split_index += 1
+
+        if split:
+            positions = block._children_positions()
+            child_size = block._child_size()
+            level = block.level + 1
+            children = []
+            for position in positions:
+                child = Block(position, child_size, None, level, max_depth)
+                child._parent = block
+                children.append(child)
+            block.children = children
+            pending.append(children[3])
+            pending.append(children[2])
+            pending.append(children[1])
+            pending.append(children[0])
+        else:
+            if leaf_index == num_leaves:
+                raise ValueError('The board has more leaves than encoded.')
+            bit = leaf_index * colour_bits
+            index = view[colour_offset + (bit >> 3)] >> (bit & 7) & mask
+            if index >= len(COLOUR_LIST):
+                raise ValueError(f'There is no colour with index {index}.')
+            block.colour = COLOUR_LIST[index]
+            leaf_index += 1
+
+    if split_index != num_splits or leaf_index != num_leaves:
+        raise ValueError('The board has fewer Blocks than encoded.')
+    return board
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'struct', 'block',
+            'settings'
+        ],
+        'max-locals': 26
+    })
+
+    import doctest
+    doctest.testmod()
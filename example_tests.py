@@ -24,16 +24,30 @@ Please use this as a starting point to check your work and write your own
 tests!
 """
 from typing import List, Optional, Tuple
+import io
+import json
 import os
+import random
+import time
 import pygame
 import pytest
 
-from block import Block
-from blocky import _block_to_squares
-from goal import BlobGoal, PerimeterGoal, _flatten
-from player import _get_block
+from actions import ACTION_PENALTY
+from array_block import ArrayBoard
+from block import Block, undo
+from board_layer import BoardLayer
+from blocky import _block_to_squares, GameData, MainState
+from codec import decode, encode
+from game import _run_states
+from goal import BlobGoal, PerimeterGoal, TranspositionTable, _flatten
+from headless import play_game, simulate_game
+from move_index import MoveIndex
+from player import _get_block, _get_blocks, _score_move, _valid_moves, \
+    RandomPlayer, SearchPlayer, SmartPlayer, shutdown_pools
 from renderer import Renderer
+from replay import replay_log
 from settings import COLOUR_LIST
+from tournament import Configuration, run_tournament, _play_seeded
 
 
 def set_children(block: Block, colours: List[Optional[Tuple[int, int, int]]]) \
@@ -124,6 +138,22 @@ def board_16x16_rotate1() -> Block:
     return board
 
 
+@pytest.fixture
+def deep_board() -> Block:
+    """Create a board with a size of 750 and a max_depth of 10, smashed down
+    to level 10 in its lower right corner, where rounded sizes put some
+    blocks' corners outside their parents.
+    """
+    random.seed(1)
+    board = Block((0, 0), 750, COLOUR_LIST[0], 0, 10)
+    block = board
+    for _ in range(10):
+        if len(block.children) == 0:
+            block.smash()
+        block = block.children[3]
+    return board
+
+
 @pytest.fixture
 def flattened_board_16x16() -> List[List[Tuple[int, int, int]]]:
     """Create a list of the unit cells inside the reference board."""
@@ -205,6 +235,49 @@ class TestRender:
         renderer.draw_board(_block_to_squares(board_16x16))
         renderer.save_to_file('your-rotate-1.png')
 
+    def test_board_layer(self, renderer, board_16x16) -> None:
+        """Test that the board drawn again only where a move changed it looks
+        the same as the board drawn in full, and that its squares are only
+        worked out again after a move.
+        """
+        player = RandomPlayer(0, BlobGoal(COLOUR_LIST[1]))
+        data = GameData(board_16x16, [player])
+        layer = BoardLayer()
+        squares = data.squares()
+        renderer.clear()
+        layer.draw(renderer, board_16x16, squares)
+        assert data.squares() is squares
+
+        move = ('rotate', 1, board_16x16.children[0])
+        assert data.apply_move(player, move)
+        layer.mark_dirty(move[2])
+        assert data.squares() is not squares
+
+        screen = pygame.display.get_surface()
+        renderer.clear()
+        layer.draw(renderer, board_16x16, data.squares())
+        drawn = pygame.image.tostring(screen, 'RGB')
+        renderer.clear()
+        renderer.draw_board(_block_to_squares(board_16x16))
+        assert drawn == pygame.image.tostring(screen, 'RGB')
+
+    def test_event_driven_loop(self, renderer, board_16x16) -> None:
+        """Test that the event driven game loop renders a game that is
+        waiting for a player once, and sleeps until the window is closed.
+        """
+        data = GameData(board_16x16,
+                        [RandomPlayer(0, BlobGoal(COLOUR_LIST[1]))])
+        data.max_turns = 5
+        state = MainState(data)
+        assert state.render_key() == state.render_key()
+
+        pygame.event.clear()
+        pygame.time.set_timer(pygame.QUIT, 300, 1)
+        report = _run_states(renderer, state, True)
+        assert report['frames'] == 1
+        assert report['updates'] <= 3
+        assert report['elapsed_ms'] >= 250
+
 
 class TestBlock:
     """A collection of methods that test the Block class.
@@ -243,6 +316,85 @@ class TestBlock:
                 # There should only be either 0 or 4 children (RI)
                 assert False
 
+    def test_path_copy(self, board_16x16) -> None:
+        """Test that a path copy of the reference board shares the subtrees off
+        the path, and that changing it leaves the original unchanged.
+        """
+        target = board_16x16.children[0].children[3]
+        original = board_16x16.create_copy()
+        board_copy, target_copy = board_16x16.path_copy(target)
+
+        assert board_copy == board_16x16
+        assert board_copy.children[1] is board_16x16.children[1]
+        assert target_copy is not target
+        assert target_copy.paint(COLOUR_LIST[0])
+        assert board_copy != board_16x16
+        assert board_16x16 == original
+
+    def test_path_copy_deep(self, deep_board) -> None:
+        """Test that a path copy of the deep board follows the path to each
+        of its blocks.
+        """
+        pending = [deep_board]
+        while len(pending) > 0:
+            target = pending.pop()
+            pending.extend(target.children)
+            board_copy, target_copy = deep_board.path_copy(target)
+            assert board_copy._path_to(target_copy) == \
+                deep_board._path_to(target)
+
+    def test_path_copy_keeps_parents(self, board_16x16) -> None:
+        """Test that scoring a path copy of the reference board does not take
+        over the children it shares, so that the board's cached scores are
+        still forgotten when it changes.
+        """
+        goal = BlobGoal(COLOUR_LIST[0])
+        board_copy, _ = board_16x16.path_copy(
+            board_16x16.children[0].children[3])
+        assert goal.score(board_copy) == 1
+        assert goal.score(board_16x16) == 1
+
+        board_16x16.children[0].children[1].paint(COLOUR_LIST[0])
+        assert goal.score(board_16x16) == 2
+
+    def test_undo(self, board_16x16) -> None:
+        """Test that undoing a sequence of moves on the reference board
+        restores it exactly, including removed and randomly created children.
+        """
+        original = board_16x16.create_copy()
+        journal = []
+
+        assert board_16x16.children[0].combine(journal)
+        assert board_16x16.children[1].smash(journal)
+        assert board_16x16.rotate(3, journal)
+        assert board_16x16.swap(1, journal)
+        assert len(journal) == 4
+
+        undo(journal, 2)
+        assert len(journal) == 2
+        undo(journal)
+        assert journal == []
+        assert board_16x16 == original
+
+    def test_lazy_layout(self, board_16x16, board_16x16_rotate1) -> None:
+        """Test that a lazily laid out board reports the same positions and
+        children as an eager one after rotating and swapping.
+        """
+        lazy = board_16x16.create_copy()
+        lazy.set_lazy(True)
+        lazy.children[0].rotate(1)
+        assert lazy == board_16x16_rotate1
+
+        board_16x16_rotate1.rotate(3)
+        board_16x16_rotate1.swap(1)
+        lazy.rotate(3)
+        lazy.swap(1)
+        assert lazy.children[2].children[0].position == (188, 375)
+        assert lazy == board_16x16_rotate1
+
+        lazy.set_lazy(False)
+        assert lazy == board_16x16_rotate1
+
     def test_swap0(self, board_16x16, board_16x16_swap0) -> None:
         """Test that the reference board can be correctly swapped along the
         horizontal plane.
@@ -258,6 +410,216 @@ class TestBlock:
         assert board_16x16 == board_16x16_rotate1
 
 
+class TestArrayBlock:
+    """A collection of methods that test the array-backed board engine against
+    the reference boards.
+    """
+    def test_from_block(self, board_16x16) -> None:
+        """Test that converting the reference board keeps it equal.
+        """
+        board = ArrayBoard.from_block(board_16x16).root()
+        assert board == board_16x16
+        assert board.to_block() == board_16x16
+
+    def test_swap0(self, board_16x16, board_16x16_swap0) -> None:
+        """Test that the array engine swaps the reference board the same way as
+        Block.swap.
+        """
+        board = ArrayBoard.from_block(board_16x16).root()
+        assert board.swap(0)
+        assert board == board_16x16_swap0
+
+    def test_rotate1(self, board_16x16, board_16x16_rotate1) -> None:
+        """Test that the array engine rotates the top-right block the same way
+        as Block.rotate.
+        """
+        board = ArrayBoard.from_block(board_16x16).root()
+        assert board.children[0].rotate(1)
+        assert board == board_16x16_rotate1
+
+    def test_copy_is_independent(self, board_16x16) -> None:
+        """Test that changing a copy of an array board leaves the original
+        unchanged.
+        """
+        board = ArrayBoard.from_block(board_16x16).root()
+        copy = board.create_copy()
+        assert copy == board
+        copy.children[0].combine()
+        assert board == board_16x16
+        assert copy != board
+
+    def test_path_copy(self, board_16x16) -> None:
+        """Test that changing the copy of a block in a path copy of an array
+        board leaves the original unchanged.
+        """
+        board = ArrayBoard.from_block(board_16x16).root()
+        board_copy, target_copy = board.path_copy(
+            board.children[0].children[3])
+        assert target_copy.position == board_16x16.children[0].children[3] \
+            .position
+        assert target_copy.paint(COLOUR_LIST[0])
+        assert board == board_16x16
+        assert board_copy != board
+
+    def test_undo(self, board_16x16) -> None:
+        """Test that undoing a sequence of moves on an array board restores
+        it exactly, in the same way as undoing them on a Block.
+        """
+        board = ArrayBoard.from_block(board_16x16).root()
+        journal = []
+
+        assert board.children[0].children[0].paint(COLOUR_LIST[2], journal)
+        assert board.children[0].combine(journal)
+        assert board.children[1].smash(journal)
+        assert board.rotate(3, journal)
+        assert board.swap(1, journal)
+        assert len(journal) == 5
+
+        undo(journal, 2)
+        assert len(journal) == 2
+        undo(journal)
+        assert journal == []
+        assert board == board_16x16
+
+    def test_grid_hash(self, board_16x16) -> None:
+        """Test that an array board hashes the same as the Block it was
+        converted from, before and after a move.
+        """
+        board = ArrayBoard.from_block(board_16x16).root()
+        assert board.grid_hash() == board_16x16.grid_hash()
+        assert board.children[0].rotate(1)
+        assert board_16x16.children[0].rotate(1)
+        assert board.grid_hash() == board_16x16.grid_hash()
+        assert board.children[0].grid_hash() == \
+            board_16x16.children[0].grid_hash()
+
+
+class TestCodec:
+    """A collection of methods that test the binary encoding of boards.
+    """
+    def test_roundtrip(self, board_16x16) -> None:
+        """Test that decoding an encoded board gives an equal board, even when
+        it is read from a slice of a larger buffer.
+        """
+        data = encode(board_16x16)
+        assert decode(data) == board_16x16
+        assert decode(memoryview(b'xx' + data + b'yy')[2:-2]) == board_16x16
+
+    def test_invalid_data(self, board_16x16) -> None:
+        """Test that decoding data that is not an encoded board raises a
+        ValueError.
+        """
+        data = encode(board_16x16)
+        with pytest.raises(ValueError):
+            decode(data[:-1])
+        with pytest.raises(ValueError):
+            decode(b'JUNK' + data[4:])
+
+
+class TestGameData:
+    """A collection of methods that test how GameData keeps track of each
+    player's score.
+    """
+    def test_scores_follow_moves(self, board_16x16) -> None:
+        """Test that the scores kept by GameData match scores computed from
+        scratch after each move.
+        """
+        players = [RandomPlayer(0, PerimeterGoal(COLOUR_LIST[1])),
+                   RandomPlayer(1, BlobGoal(COLOUR_LIST[3]))]
+        data = GameData(board_16x16, players)
+        data.verify_scores = True
+        data.max_turns = 5
+        state = MainState(data)
+
+        assert state._do_move(('rotate', 1, board_16x16.children[0]))
+        assert state._do_move(('swap', 0, board_16x16))
+        assert state._do_move(('paint', None, board_16x16.children[1]
+                               .children[3]))
+        for player in players:
+            data.calculate_score(player.id)
+
+        assert data.calculate_score(0) == (PerimeterGoal(COLOUR_LIST[1])
+                                           .score(board_16x16), 1)
+
+    def test_scores_follow_moves_deep(self, deep_board) -> None:
+        """Test that the scores kept by GameData match scores computed from
+        scratch after painting every unit cell of the deep board.
+        """
+        players = [RandomPlayer(0, PerimeterGoal(COLOUR_LIST[1])),
+                   RandomPlayer(1, BlobGoal(COLOUR_LIST[1]))]
+        data = GameData(deep_board, players)
+        data.verify_scores = True
+        state = MainState(data)
+
+        pending = [deep_board]
+        while len(pending) > 0:
+            block = pending.pop()
+            pending.extend(block.children)
+            if block.level == block.max_depth:
+                state._do_move(('paint', None, block))
+        for player in players:
+            data.calculate_score(player.id)
+
+    def test_play_game(self, board_16x16) -> None:
+        """Test that a game between computer players can be played to the
+        end without a display.
+        """
+        players = [RandomPlayer(0, PerimeterGoal(COLOUR_LIST[1])),
+                   SmartPlayer(1, BlobGoal(COLOUR_LIST[3]), 3)]
+        data = GameData(board_16x16, players)
+        data.verify_scores = True
+        data.max_turns = 4
+
+        scores, winner = play_game(data)
+        assert [score[0] for score in scores] == [0, 1]
+        assert winner in [0, 1]
+
+    def test_seeded_game_is_reproducible(self) -> None:
+        """Test that a game played from a seed does not depend on the random
+        module.
+        """
+        results = []
+        for module_seed in [1, 2]:
+            random.seed(module_seed)
+            results.append(simulate_game(3, 1, [3], 3, seed=148))
+
+        assert results[0] == results[1]
+
+    def test_replay_log(self) -> None:
+        """Test that replaying a move log gives the scores of the logged
+        games, and that a log that does not match its moves is rejected.
+        """
+        log = io.StringIO()
+        results = [simulate_game(3, 2, [2], 3, log=log) for _ in range(2)]
+        lines = log.getvalue().splitlines()
+        assert [data.final_scores() for _, data in replay_log(lines)] == \
+            results
+
+        lines[1] = lines[1].replace('"scores":[[', '"scores":[[-1', 1)
+        with pytest.raises(ValueError):
+            list(replay_log(lines))
+
+
+class TestTournament:
+    """A collection of methods that test the tournament runner.
+    """
+    def test_games_are_reproducible(self) -> None:
+        """Test that every game of a tournament is written out, and can be
+        played again from its seed.
+        """
+        config = Configuration('test', 2, 1, [2], PerimeterGoal, 2)
+        out = io.StringIO()
+        summary = run_tournament([config], 3, 148, out, 2)
+        assert summary['configs']['test']['games'] == 3
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert sorted(record['game'] for record in records) == [0, 1, 2]
+        for record in records:
+            again = _play_seeded((config, record['game'], record['seed'],
+                                  False))
+            assert again['players'] == record['players']
+
+
 class TestPlayer:
     """A collection of methods for testing the methods and functions in the
     player module.
@@ -283,6 +645,210 @@ class TestPlayer:
         assert _get_block(board_16x16, top_right, 2) == \
             board_16x16.children[0].children[0]
 
+    def test_get_block_past_edge(self, board_16x16) -> None:
+        """Test that a block that reaches a pixel past the edge of its parent,
+        since sizes are rounded, is found there.
+        """
+        top_right = board_16x16.children[0].children[0]
+        assert top_right.position == (563, 0) and top_right.size == 188
+        assert _get_block(board_16x16, (750, 0), 2) is top_right
+        assert _get_block(board_16x16, (750, 0), 1) is None
+
+    def test_get_blocks(self, board_16x16) -> None:
+        """Test that looking up many blocks at once gives the same blocks as
+        looking them up one at a time.
+        """
+        queries = [((x, y), level) for x in range(0, 760, 47)
+                   for y in range(0, 760, 53) for level in range(3)]
+        expected = [_get_block(board_16x16, location, level)
+                    for location, level in queries]
+        assert _get_blocks(board_16x16, queries) == expected
+
+    def test_smart_player_parallel(self, board_16x16) -> None:
+        """Test that a SmartPlayer chooses the same move whether it scores its
+        candidates in one process or in several.
+        """
+        moves = []
+        for workers in [1, 2]:
+            random.seed(148)
+            player = SmartPlayer(0, BlobGoal(COLOUR_LIST[1]), 20, workers)
+            player.proceed()
+            action, direction, block = player.generate_move(board_16x16)
+            moves.append((action, direction, block.position, block.level))
+        shutdown_pools()
+
+        assert moves[0] == moves[1]
+
+    def test_smart_player_background(self, board_16x16) -> None:
+        """Test that a SmartPlayer thinking in the background chooses the same
+        move as one that blocks, on the board it was given, and that it can
+        be cancelled.
+        """
+        expected = SmartPlayer(0, BlobGoal(COLOUR_LIST[1]), 20,
+                               rng=random.Random(148))
+        expected.proceed()
+        expected = expected.generate_move(board_16x16)
+
+        player = SmartPlayer(0, BlobGoal(COLOUR_LIST[1]), 20,
+                             rng=random.Random(148))
+        player.background = True
+        player.proceed()
+        move = None
+        while move is None:
+            move = player.generate_move(board_16x16)
+        assert move == expected
+        assert not player.thinking()
+        assert player.generate_move(board_16x16) is None
+
+        player.proceed()
+        player.generate_move(board_16x16)
+        player.cancel()
+        assert not player.thinking()
+
+    def test_smart_player_time_budget(self, board_16x16) -> None:
+        """Test that a SmartPlayer with a time budget tries moves until its
+        budget is spent, and tries one even if it has no time to.
+        """
+        player = SmartPlayer(0, BlobGoal(COLOUR_LIST[1]), 1,
+                             rng=random.Random(148), time_budget=50)
+        player.proceed()
+        start = time.perf_counter()
+        assert player.generate_move(board_16x16) is not None
+        assert time.perf_counter() - start < 1
+        assert player.candidates > 1
+
+        player.time_budget = 0
+        player.proceed()
+        assert player.generate_move(board_16x16) is not None
+        assert player.candidates == 1
+
+    def test_smart_player_time_budget_background(self) -> None:
+        """Test that a SmartPlayer thinking in the background with a time
+        budget spends it on trying moves, even on a board with many blocks
+        to index.
+        """
+        rng = random.Random(148)
+        board = Block((0, 0), 750, None, 0, 5)
+        pending = [board]
+        while len(pending) > 0:
+            block = pending.pop()
+            if block.level + 1 < block.max_depth:
+                set_children(block, [None] * 4)
+            else:
+                set_children(block, [rng.choice(COLOUR_LIST)
+                                     for _ in range(4)])
+            pending.extend(child for child in block.children
+                           if child.colour is None)
+
+        player = SmartPlayer(0, BlobGoal(COLOUR_LIST[1]), 1, rng=rng,
+                             time_budget=1)
+        player.background = True
+        player.proceed()
+        move = None
+        while move is None:
+            move = player.generate_move(board)
+        assert player.candidates >= 1
+
+    def test_search_player(self, board_16x16) -> None:
+        """Test that a SearchPlayer counts penalties, searches to its depth
+        against an opponent, and leaves the board as it was.
+        """
+        goal = BlobGoal(COLOUR_LIST[1])
+        best = goal.score(board_16x16)
+        for action, direction, block in _valid_moves(board_16x16, goal):
+            score = _score_move(board_16x16, goal, block,
+                                (action, direction), 0)
+            best = max(best, score - ACTION_PENALTY[(action, direction)])
+
+        player = SearchPlayer(0, goal, 8, 1, rng=random.Random(148))
+        player.proceed()
+        action, direction, block = player.generate_move(board_16x16)
+        assert _score_move(board_16x16, goal, block, (action, direction),
+                           0) - ACTION_PENALTY[(action, direction)] == best
+
+        expected = encode(board_16x16)
+        player = SearchPlayer(0, goal, 4, 3, [PerimeterGoal(COLOUR_LIST[3])],
+                              rng=random.Random(148))
+        player.proceed()
+        assert player.generate_move(board_16x16) is not None
+        assert player.stats['depth'] == 3
+        assert player.stats['nodes'] > 0
+        assert encode(board_16x16) == expected
+
+        player.time_budget = 0
+        player.proceed()
+        assert player.generate_move(board_16x16) == ('pass', None,
+                                                     board_16x16)
+        assert player.stats['depth'] == 0
+
+    def test_valid_moves(self, board_16x16) -> None:
+        """Test that every move on the reference board is enumerated once,
+        that each one changes the board, and that the board is left as it
+        was.
+        """
+        # Swapping the top-right block vertically now leaves it as it was.
+        assert board_16x16.children[0].children[0].paint(COLOUR_LIST[3])
+        goal = BlobGoal(COLOUR_LIST[1])
+        copy = board_16x16.create_copy()
+        moves = list(_valid_moves(board_16x16, goal))
+        assert board_16x16 == copy
+        keys = [(id(move[2]), move[0], move[1]) for move in moves]
+        assert len(set(keys)) == len(moves)
+
+        for action, direction, block in moves:
+            if action != 'smash':
+                board = board_16x16.create_copy()
+                target = board._follow(board_16x16._path_to(block))
+                if action == 'paint':
+                    assert target.paint(goal.colour)
+                elif action == 'combine':
+                    assert target.combine()
+                else:
+                    assert getattr(target, action)(direction)
+                assert _flatten(board) != _flatten(board_16x16)
+
+        top_right = [move[:2] for move in moves
+                     if move[2] is board_16x16.children[0]]
+        assert ('swap', 0) in top_right
+        assert ('swap', 1) not in top_right
+        sample = [(id(move[2]), move[0], move[1]) for move in
+                  _valid_moves(board_16x16, goal, random.Random(1))]
+        assert sample != keys and sorted(sample) == sorted(keys)
+
+    def test_move_index(self, board_16x16) -> None:
+        """Test that the index of valid moves is kept up to date as the
+        reference board changes, and that its moves are all valid.
+        """
+        goal = BlobGoal(COLOUR_LIST[1])
+        index = MoveIndex(board_16x16)
+        # 2 parents with 4 moves each, 3 smashable leaves, 2 unit leaves of
+        # other colours, and 1 combinable parent.
+        assert index.num_moves(goal.colour) == 14
+
+        journal = []
+        assert board_16x16.children[0].combine(journal)
+        assert board_16x16.children[1].smash(journal)
+        assert board_16x16.children[1].children[0].paint(COLOUR_LIST[0],
+                                                         journal)
+        assert index.num_moves(goal.colour) == \
+            MoveIndex(board_16x16.create_copy()).num_moves(goal.colour)
+        undo(journal)
+        assert index.num_moves(goal.colour) == 14
+
+        rng = random.Random(148)
+        for _ in range(20):
+            action, direction, block = index.random_move(goal.colour, rng)
+            copy = board_16x16.create_copy()
+            target = copy._follow(board_16x16._path_to(block))
+            if action == 'smash':
+                assert target.smashable()
+            elif action == 'paint':
+                assert target.paint(goal.colour)
+            elif action == 'combine':
+                assert target.combine()
+            else:
+                assert getattr(target, action)(direction)
+
 
 class TestGoal:
     """A collection of methods for testing the sub-classes of Goal.
@@ -302,6 +868,35 @@ class TestGoal:
 
         assert result == flattened_board_16x16
 
+    def test_block_flatten_after_swap(self, board_16x16,
+                                      board_16x16_swap0) -> None:
+        """Test that flattening the reference board again after swapping it
+        does not reuse the grid cached before the swap.
+        """
+        _flatten(board_16x16)
+        board_16x16.swap(0)
+
+        assert _flatten(board_16x16) == _flatten(board_16x16_swap0)
+
+    def test_transposition_table(self, board_16x16,
+                                 board_16x16_swap0) -> None:
+        """Test that a board reached again by rotating it all the way around
+        is found in the table, and that a different board is not.
+        """
+        table = TranspositionTable()
+        goal = BlobGoal(COLOUR_LIST[3])
+        before = board_16x16.grid_hash()
+        assert table.score(goal, board_16x16) == 5
+        for _ in range(4):
+            board_16x16.rotate(1)
+        assert board_16x16.grid_hash() == before
+        assert table.score(goal, board_16x16) == 5
+        assert (table.hits, table.misses) == (1, 1)
+
+        assert board_16x16_swap0.grid_hash() != before
+        table.score(goal, board_16x16_swap0)
+        assert (table.hits, table.misses) == (1, 2)
+
     def test_blob_goal(self, board_16x16) -> None:
         correct_scores = [
             (COLOUR_LIST[0], 1),
@@ -315,6 +910,32 @@ class TestGoal:
             goal = BlobGoal(colour)
             assert goal.score(board_16x16) == expected
 
+    def test_blob_goal_after_rotate(self, board_16x16,
+                                    board_16x16_rotate1) -> None:
+        """Test that scoring the reference board again after rotating part of
+        it does not reuse the blobs cached before the rotation.
+        """
+        for colour in COLOUR_LIST:
+            BlobGoal(colour).score(board_16x16)
+        board_16x16.children[0].rotate(1)
+
+        for colour in COLOUR_LIST:
+            goal = BlobGoal(colour)
+            assert goal.score(board_16x16) == goal.score(board_16x16_rotate1)
+
+    def test_blob_goal_deep_single_colour(self) -> None:
+        """Test that a blob covering a whole deep board is scored without
+        running into the recursion limit.
+        """
+        board = Block((0, 0), 750, COLOUR_LIST[0], 0, 7)
+        goal = BlobGoal(COLOUR_LIST[0])
+        assert goal.score(board) == 4**7
+
+        flattened = _flatten(board)
+        visited = [[-1] * len(column) for column in flattened]
+        assert goal._undiscovered_blob_size((0, 0), flattened, visited) == \
+            4**7
+
     def test_perimeter_goal(self, board_16x16):
         correct_scores = [
             (COLOUR_LIST[0], 2),
@@ -25,13 +25,15 @@ Blocky game.
 At the bottom of the file, there are some function that you
 can call to try playing the game in several different configurations.
 """
-from typing import List
+from typing import Dict, List, Optional, TextIO
+import time
 import pygame
 
 from block import generate_board
 from blocky import GameData, GameState, MainState
-from player import create_players
+from player import create_players, shutdown_pools
 from renderer import Renderer
+from replay import MoveLog, read_records, ReplayState
 from settings import BOARD_SIZE
 
 
@@ -44,52 +46,146 @@ class Game:
     # _data:
     #   The data of the game that can be shared with other GameState objects.
     # _state:
-    #   The current GameState.
+    #   The GameState that the game starts in.
+    # _log:
+    #   The log that the game is written to, or None if it is not logged.
     _renderer: Renderer
     _data: GameData
     _state: GameState
+    _log: Optional[MoveLog]
 
     def __init__(self, max_depth: int,
                  num_human: int,
                  num_random: int,
-                 smart_players: List[int]) -> None:
+                 smart_players: List[int],
+                 workers: int = 1,
+                 log: Optional[TextIO] = None,
+                 search_players: Optional[List[int]] = None) -> None:
         """Initialize this game, as described in the Assignment 2 handout.
 
+        Each smart player scores its candidate moves with <workers> processes,
+        in the background so that the window keeps responding.
+        <search_players> is a list of search depths for each SearchPlayer,
+        which plays after the smart players and also thinks in the
+        background.
+        If <log> is given, the game is written to it as a move log (see
+        replay.py).
+
         Precondition:
             2 <= max_depth <= 5
         """
         board = generate_board(max_depth, BOARD_SIZE)
-        players = create_players(num_human, num_random, smart_players)
+        players = create_players(num_human, num_random, smart_players,
+                                 workers, background=True,
+                                 search_players=search_players)
 
         self._renderer = Renderer(BOARD_SIZE)
         self._data = GameData(board, players)
         self._state = MainState(self._data)
+        self._log = None if log is None else MoveLog(log)
 
-    def run_game(self, num_turns: int) -> None:
+    def run_game(self, num_turns: int,
+                 event_driven: bool = False) -> Dict[str, float]:
         """Start the main game loop and stop after num_turns.
+
+        If <event_driven> is True, the loop sleeps until something happens
+        rather than rendering 30 frames a second (see _run_states). Return
+        the report of the frames used by the loop.
         """
         self._data.max_turns = num_turns
-        clock = pygame.time.Clock()
+        if self._log is not None:
+            self._log.start(self._data)
+        return _run_states(self._renderer, self._state, event_driven)
+
+
+def _run_states(renderer: Renderer, state: GameState,
+                event_driven: bool = False) -> Dict[str, float]:
+    """Run the main game loop from <state>, drawing with <renderer>, until
+    the window is closed.
+
+    The loop runs at most 30 times a second. If <event_driven> is False, the
+    screen is rendered again every time. Otherwise, the screen is only
+    rendered again when the GameState or its render_key changes (or the
+    window needs it), and after an update that changed nothing, the loop
+    sleeps until the next event, or until the idle_timeout of the GameState
+    is up.
+
+    Return a report of the frames used by the loop, with:
+    - 'updates': the number of times the GameState was updated,
+    - 'frames': the number of times the screen was rendered,
+    - 'busy_ms': the milliseconds spent processing events, updating and
+      rendering, and
+    - 'elapsed_ms': the milliseconds the loop ran for.
+    """
+    clock = pygame.time.Clock()
+    report = {'updates': 0, 'frames': 0, 'busy_ms': 0.0, 'elapsed_ms': 0.0}
+    loop_start = time.perf_counter()
+    # The GameState and render key on the screen, and whether the last
+    # update changed nothing.
+    drawn_state = None
+    drawn_key = None
+    idle = False
+
+    while True:
+        clock.tick(30)
+
+        events = []
+        if event_driven and idle:
+            timeout = state.idle_timeout()
+            if timeout is None:
+                events.append(pygame.event.wait())
+            elif timeout > 0:
+                events.append(pygame.event.wait(timeout))
+        events.extend(pygame.event.get())
+        start = time.perf_counter()
+
+        # Process events
+        if any(e.type == pygame.QUIT for e in events):
+            state.close()
+            shutdown_pools()
+            break
+        exposed = False
+        for e in events:
+            if e.type == pygame.VIDEOEXPOSE:
+                exposed = True
+            elif e.type != pygame.NOEVENT:
+                state.process_event(e)
+
+        # Update the state of the game
+        previous = state
+        state = state.update()
+        report['updates'] += 1
+
+        key = state.render_key() if event_driven else None
+        if key is None or exposed or state is not drawn_state or \
+                key != drawn_key:
+            # Render the new state of the game
+            renderer.clear()
+            state.render(renderer)
+            report['frames'] += 1
 
-        while True:
-            clock.tick(30)
+            # Update the screen
+            pygame.display.flip()
+            drawn_state = state
+            drawn_key = key
+            idle = False
+        else:
+            idle = state is previous
 
-            # Process events
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    return
-                else:
-                    self._state.process_event(e)
+        report['busy_ms'] += (time.perf_counter() - start) * 1000
 
-            # Update the state of the game
-            self._state = self._state.update()
+    report['elapsed_ms'] = (time.perf_counter() - loop_start) * 1000
+    return report
 
-            # Render the new state of the game
-            self._renderer.clear()
-            self._state.render(self._renderer)
 
-            # Update the screen
-            pygame.display.flip()
+def replay_game(log: TextIO, event_driven: bool = False) -> Dict[str, float]:
+    """Step through the first game in the move <log> on screen, one move
+    each time the space bar or the right arrow key is pressed.
+
+    <event_driven> and the report returned are as for _run_states.
+    """
+    return _run_states(Renderer(BOARD_SIZE), ReplayState(read_records(log)),
+                       event_driven)
 
 
 def create_auto_game() -> Game:
@@ -122,9 +218,12 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'allowed-io': ['run_game'],
         'allowed-import-modules': [
-            'doctest', 'python_ta', 'random', 'typing', 'pygame', 'blocky',
-            'block', 'goal', 'player', 'renderer', 'settings'
+            'doctest', 'python_ta', 'random', 'time', 'typing', 'pygame',
+            'blocky', 'block', 'goal', 'player', 'renderer', 'replay',
+            'settings'
         ],
+        'max-args': 7,
+        'max-locals': 16,
         'generated-members': 'pygame.*'
     })
 
@@ -140,7 +239,7 @@ if __name__ == '__main__':
     # game = create_two_player_game()
     game = create_solitaire_game()
 
-    # Run the game for 5 turns
-    game.run_game(5)
+    # Run the game for 5 turns, sleeping while nothing happens
+    game.run_game(5, event_driven=True)
 
     pygame.quit()
@@ -23,29 +23,42 @@ This file contains the hierarchy of Goal classes.
 """
 from __future__ import annotations
 import random
-from typing import List, Tuple
+from collections import OrderedDict
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
 from block import Block
 from settings import colour_name, COLOUR_LIST
 
 
-def generate_goals(num_goals: int) -> List[Goal]:
+def generate_goals(num_goals: int, goal_type: Optional[type] = None,
+                   rng: Optional[random.Random] = None) -> List[Goal]:
     """Return a randomly generated list of goals with length num_goals.
 
     All elements of the list must be the same type of goal, but each goal
     must have a different randomly generated colour from COLOUR_LIST. No two
     goals can have the same colour.
 
+    The type of goal is <goal_type> if it is given, and is chosen randomly
+    otherwise. Random choices are drawn from <rng>, or from the random module
+    if it is None.
+
     Precondition:
         - num_goals <= len(COLOUR_LIST)
+        - goal_type is None or goal_type in [PerimeterGoal, BlobGoal]
     """
+    if rng is None:
+        rng = random
     goals = []
     colour_choices = []
     while len(colour_choices) != num_goals:
-        index = random.randint(0, len(COLOUR_LIST)-1)
+        index = rng.randint(0, len(COLOUR_LIST)-1)
         colour = COLOUR_LIST[index]
         if colour not in colour_choices:
             colour_choices.append(colour)
-    goal_index = random.randint(0, 2)
+    if goal_type is None:
+        goal_index = rng.randint(0, 2)
+    else:
+        goal_index = 0 if goal_type is PerimeterGoal else 1
     if goal_index == 0:
         for c in colour_choices:
             goals.append(PerimeterGoal(c))
@@ -72,29 +85,275 @@ def _flatten(block: Block) -> List[List[Tuple[int, int, int]]]:
 
     L[0][0] represents the unit cell in the upper left corner of the Block.
     """
-    lst = []
-    for i in range(2**(block.max_depth - block.level)):
-        lst.append([])
-
     if len(block.children) == 0:
-        for item in lst:
-            for i in range(len(lst)):
-                item.append(block.colour)
+        side = 2**(block.max_depth - block.level)
+        lst = [[block.colour] * side for _ in range(side)]
     else:
         child0 = _flatten(block.children[0])
         child1 = _flatten(block.children[1])
         child2 = _flatten(block.children[2])
         child3 = _flatten(block.children[3])
+        lst = []
         for i in range(len(child1)):
-            lst[i].extend(child1[i])
-            lst[i].extend(child2[i])
+            lst.append(child1[i] + child2[i])
         for j in range(len(child0)):
-            lst[j+len(child1)].extend(child0[j])
-            lst[j+len(child1)].extend(child3[j])
+            lst.append(child0[j] + child3[j])
 
     return lst
 
 
+def _find(parents: List[int], item: int) -> int:
+    """Return the representative of the set containing <item> in the
+    union-find forest <parents>, halving the path to it along the way.
+    """
+    while parents[item] != item:
+        parents[item] = parents[parents[item]]
+        item = parents[item]
+    return item
+
+
+def _union(parents: List[int], sizes: List[int], a: int, b: int) -> None:
+    """Merge the sets containing <a> and <b> in the union-find forest
+    <parents>, where <sizes> holds the total size of each representative's
+    set.
+    """
+    a = _find(parents, a)
+    b = _find(parents, b)
+    if a == b:
+        return
+    if sizes[a] < sizes[b]:
+        a, b = b, a
+    parents[b] = a
+    sizes[a] += sizes[b]
+
+
+def _stitch(parents: List[int], sizes: List[int],
+            first: List[Tuple[int, int, int]],
+            second: List[Tuple[int, int, int]]) -> None:
+    """Merge the sets of every pair of segments from <first> and <second>
+    that overlap, in the union-find forest <parents>.
+
+    <first> and <second> are the segments along the two sides of a seam
+    between blocks, each given as (start, end, item) and sorted by start.
+    """
+    i = 0
+    for start, end, item in first:
+        while i < len(second) and second[i][1] <= start:
+            i += 1
+        j = i
+        while j < len(second) and second[j][0] < end:
+            _union(parents, sizes, item, second[j][2])
+            j += 1
+
+
+def _largest_blob(grid: List[List[Tuple[int, int, int]]],
+                  colour: Tuple[int, int, int]) -> int:
+    """Return the number of unit cells in the largest blob of <colour> in
+    <grid>, a list of columns as returned by _flatten.
+
+    Each column is split into runs of consecutive <colour> cells, and runs in
+    neighbouring columns that share a row are merged with union-find. No
+    recursion is used, so this works for boards of any depth.
+    """
+    parents = []
+    sizes = []
+    previous = []
+    for column in grid:
+        runs = []
+        row = 0
+        for cell, group in groupby(column):
+            length = len(list(group))
+            if cell == colour:
+                runs.append((row, row + length, len(parents)))
+                parents.append(len(parents))
+                sizes.append(length)
+            row += length
+
+        # Merge each run with the runs of the previous column it touches.
+        _stitch(parents, sizes, runs, previous)
+        previous = runs
+
+    largest = 0
+    for run in range(len(parents)):
+        if parents[run] == run and sizes[run] > largest:
+            largest = sizes[run]
+    return largest
+
+
+class _BlobSummary:
+    """A summary of the blobs of one colour within a block, from which the
+    summary of its parent can be built without looking inside the block.
+
+    === Attributes ===
+    largest:
+        The number of unit cells in the largest blob within the block.
+    sizes:
+        The number of unit cells in each blob that touches an edge of the
+        block, indexed by a number local to this summary.
+    edges:
+        The segments of the colour along the top, right, bottom and left
+        edges of the block, in that order. Each segment is (start, end, blob)
+        in unit cells from the upper left corner of the block, sorted by
+        start, where blob is an index into sizes.
+    """
+    largest: int
+    sizes: List[int]
+    edges: Tuple[List[Tuple[int, int, int]], ...]
+
+    def __init__(self, largest: int, sizes: List[int],
+                 edges: Tuple[List[Tuple[int, int, int]], ...]) -> None:
+        """Initialize this summary with the given attributes.
+        """
+        self.largest = largest
+        self.sizes = sizes
+        self.edges = edges
+
+
+def _relabel(first: List[Tuple[int, int, int]],
+             second: List[Tuple[int, int, int]], half: int,
+             parents: List[int], labels: Dict[int, int]) \
+        -> List[Tuple[int, int, int]]:
+    """Return the segments along an edge of a block made of the edge
+    segments <first> of one child followed by the edge segments <second> of
+    the next child, which start <half> unit cells further along.
+
+    Each blob is replaced by a new label for its set in <parents>. New labels
+    are added to <labels>, which maps the representative of each set to its
+    label. Consecutive segments that end up with the same label are joined
+    into one.
+    """
+    result = []
+    segments = first + [(start + half, end + half, blob)
+                        for start, end, blob in second]
+    for start, end, blob in segments:
+        root = _find(parents, blob)
+        if root not in labels:
+            labels[root] = len(labels)
+        label = labels[root]
+        if result and result[-1][1] == start and result[-1][2] == label:
+            result[-1] = (result[-1][0], end, label)
+        else:
+            result.append((start, end, label))
+    return result
+
+
+def _blob_summary(block: Block, colour: Tuple[int, int, int]) -> _BlobSummary:
+    """Return the summary of the blobs of <colour> within <block>.
+
+    The summary of a parent is stitched together from those of its children
+    along the seams between them. Summaries are cached on each block, so
+    after a change only the blocks on the path from the root to the changed
+    block are summarized again, each at a cost proportional to its edges.
+    """
+    key = f'blob {colour}'
+    cached = block._cache_get(key)
+    if cached is not None:
+        return cached
+
+    if len(block.children) == 0:
+        if block.colour != colour:
+            summary = _BlobSummary(0, [], ([], [], [], []))
+        else:
+            side = 2**(block.max_depth - block.level)
+            edge = [(0, side, 0)]
+            summary = _BlobSummary(side * side, [side * side],
+                                   (edge, edge, edge, edge))
+        block._cache_put(key, summary)
+        return summary
+
+    # Give the edge blobs of all four children distinct numbers, so that they
+    # can share one union-find forest.
+    children = []
+    parents = []
+    sizes = []
+    largest = 0
+    for child in block.children:
+        child_summary = _blob_summary(child, colour)
+        offset = len(parents)
+        children.append([[(start, end, blob + offset)
+                          for start, end, blob in edge]
+                         for edge in child_summary.edges])
+        parents.extend(range(offset, offset + len(child_summary.sizes)))
+        sizes.extend(child_summary.sizes)
+        largest = max(largest, child_summary.largest)
+    upper_right, upper_left, lower_left, lower_right = children
+
+    _stitch(parents, sizes, upper_left[1], upper_right[3])
+    _stitch(parents, sizes, lower_left[1], lower_right[3])
+    _stitch(parents, sizes, upper_left[2], lower_left[0])
+    _stitch(parents, sizes, upper_right[2], lower_right[0])
+
+    for blob in range(len(parents)):
+        if parents[blob] == blob and sizes[blob] > largest:
+            largest = sizes[blob]
+
+    half = 2**(block.max_depth - block.level - 1)
+    labels = {}
+    edges = (
+        _relabel(upper_left[0], upper_right[0], half, parents, labels),
+        _relabel(upper_right[1], lower_right[1], half, parents, labels),
+        _relabel(lower_left[2], lower_right[2], half, parents, labels),
+        _relabel(upper_left[3], lower_left[3], half, parents, labels)
+    )
+    edge_sizes = [0] * len(labels)
+    for root, label in labels.items():
+        edge_sizes[label] = sizes[root]
+
+    summary = _BlobSummary(largest, edge_sizes, edges)
+    block._cache_put(key, summary)
+    return summary
+
+
+# The edges of a block, as bits that can be combined into a set of edges.
+_TOP = 1
+_RIGHT = 2
+_BOTTOM = 4
+_LEFT = 8
+_ALL_EDGES = _TOP | _RIGHT | _BOTTOM | _LEFT
+
+# The edges of its parent that each child touches, in the order of
+# Block.children: upper-right, upper-left, lower-left, lower-right.
+_CHILD_EDGES = [_TOP | _RIGHT, _TOP | _LEFT, _BOTTOM | _LEFT, _BOTTOM | _RIGHT]
+
+
+def _edges_touched(board: Block, block: Block) -> int:
+    """Return the set of edges of <board> that <block> touches.
+
+    Precondition: <block> is <board> or one of its descendants.
+    """
+    # The path is followed by child index rather than by position, since
+    # with rounded sizes a Block's corner can lie outside its ancestors.
+    edges = _ALL_EDGES
+    for i in board._path_to(block):
+        edges &= _CHILD_EDGES[i]
+    return edges
+
+
+def _perimeter_cells(block: Block, colour: Tuple[int, int, int],
+                     edges: int) -> int:
+    """Return the number of unit cells of <colour> that lie in <block> and
+    along the board edges in <edges>, counting a cell once for each of those
+    edges that it lies along.
+
+    <edges> is the set of board edges that <block> touches. Only the blocks
+    that touch one of those edges are visited, so the cost grows with the
+    length of the edges rather than with the area of <block>.
+    """
+    if edges == 0:
+        return 0
+    elif len(block.children) == 0:
+        if block.colour != colour:
+            return 0
+        side = 2**(block.max_depth - block.level)
+        return side * bin(edges).count('1')
+    else:
+        total = 0
+        for i in range(4):
+            total += _perimeter_cells(block.children[i], colour,
+                                      edges & _CHILD_EDGES[i])
+        return total
+
+
 class Goal:
     """A player goal in the game of Blocky.
 
@@ -119,6 +378,26 @@ class Goal:
         """
         raise NotImplementedError
 
+    def cell_score(self, cells: List[List[Tuple[int, int, int]]]) -> int:
+        """Return the score for this goal on a board given as the columns of
+        its unit cells, in the format returned by _flatten.
+
+        This gives the same result as score, and is meant for checking it.
+        """
+        raise NotImplementedError
+
+    def region_score(self, board: Block, block: Block) -> Optional[int]:
+        """Return the part of the score for this goal on <board> that comes
+        from the unit cells within <block>, or None if this goal's score
+        cannot be split up by region.
+
+        When this is not None, a change within <block> changes the score by
+        exactly the change in region_score.
+
+        Precondition: <block> is <board> or one of its descendants.
+        """
+        return None
+
     def description(self) -> str:
         """Return a description of this goal.
         """
@@ -149,24 +428,49 @@ class PerimeterGoal(Goal):
         Swapping, Smashing, Painting, Combining, or Passing here (if any).
 
         The score returned must always be greater than or equal to zero.
+
+        Only the blocks along the edges of <board> are visited. A corner cell
+        lies along two edges, so counting each cell once per edge it lies
+        along gives corners their two points.
+        """
+        return self.region_score(board, board)
+
+    def region_score(self, board: Block, block: Block) -> int:
+        """Return the part of the score for this goal on <board> that comes
+        from the unit cells within <block>.
+
+        Only the blocks along the edges of <board> are visited.
+
+        Precondition: <block> is <board> or one of its descendants.
+        """
+        score = _perimeter_cells(block, self.colour,
+                                 _edges_touched(board, block))
+        if board.level == board.max_depth:
+            # A board of a single unit cell has that cell in all four
+            # corners, rather than along all four edges.
+            score *= 2
+        return score
+
+    def cell_score(self, cells: List[List[Tuple[int, int, int]]]) -> int:
+        """Return the score for this goal on a board given as the columns of
+        its unit cells, by reading the outer ring of cells.
         """
         score = 0
-        flat = _flatten(board)
 
         perimeter = []
-        perimeter.extend(flat[0][1:-1])
-        perimeter.extend(flat[-1][1:-1])
-        for i in range(1, len(flat) - 1):
-            perimeter.append(flat[i][0])
-            perimeter.append(flat[i][-1])
+        perimeter.extend(cells[0][1:-1])
+        perimeter.extend(cells[-1][1:-1])
+        for i in range(1, len(cells) - 1):
+            perimeter.append(cells[i][0])
+            perimeter.append(cells[i][-1])
 
-        if flat[0][0] == self.colour:
+        if cells[0][0] == self.colour:
             score += 2
-        if flat[0][-1] == self.colour:
+        if cells[0][-1] == self.colour:
             score += 2
-        if flat[-1][0] == self.colour:
+        if cells[-1][0] == self.colour:
             score += 2
-        if flat[-1][-1] == self.colour:
+        if cells[-1][-1] == self.colour:
             score += 2
 
         for element in perimeter:
@@ -209,22 +513,13 @@ class BlobGoal(Goal):
 
         The score returned must always be greater than or equal to zero.
         """
-        flattened = _flatten(board)
-        curr_max = 0
-        visited = []
-
-        for item in flattened:
-            row = [-1] * len(item)
-            visited.append(row)
-
-        for col in range(len(flattened)):
-            for row in range(len(flattened[0])):
-                poss_blob = self._undiscovered_blob_size((row, col),
-                                                         flattened, visited)
-                if poss_blob > curr_max:
-                    curr_max = poss_blob
+        return _blob_summary(board, self.colour).largest
 
-        return curr_max
+    def cell_score(self, cells: List[List[Tuple[int, int, int]]]) -> int:
+        """Return the score for this goal on a board given as the columns of
+        its unit cells.
+        """
+        return _largest_blob(cells, self.colour)
 
     def _undiscovered_blob_size(self, pos: Tuple[int, int],
                                 board: List[List[Tuple[int, int, int]]],
@@ -246,25 +541,25 @@ class BlobGoal(Goal):
 
         Update <visited> so that all cells that are visited are marked with
         either 0 or 1.
+
+        The search keeps its own stack of cells to visit instead of recursing,
+        so large blobs do not run into the recursion limit.
         """
-        col = pos[1]
-        row = pos[0]
         blob_size = 0
+        stack = [pos]
 
-        if col >= len(board) or col < 0 or row >= len(board[0]) or row < 0:
-            return 0
-        else:
+        while stack:
+            row, col = stack.pop()
+            if col >= len(board) or col < 0 or row >= len(board[0]) or \
+                    row < 0:
+                continue
             if board[col][row] == self.colour and visited[col][row] == -1:
                 blob_size += 1
                 visited[col][row] = 1
-                blob_size += self._undiscovered_blob_size((row, col+1),
-                                                          board, visited)
-                blob_size += self._undiscovered_blob_size((row, col - 1),
-                                                          board, visited)
-                blob_size += self._undiscovered_blob_size((row + 1, col),
-                                                          board, visited)
-                blob_size += self._undiscovered_blob_size((row - 1, col),
-                                                          board, visited)
+                stack.append((row - 1, col))
+                stack.append((row + 1, col))
+                stack.append((row, col - 1))
+                stack.append((row, col + 1))
             elif board[col][row] != self.colour:
                 if visited[col][row] == -1:
                     visited[col][row] = 0
@@ -276,13 +571,86 @@ class BlobGoal(Goal):
         return description
 
 
+class TranspositionTable:
+    """A bounded table of the scores of goals on boards, keyed by the
+    unit cells of the board, so that a board reached again by a different
+    sequence of moves (e.g., rotations that cancel out) is not scored again.
+
+    When the table is full, the score that was used least recently is
+    forgotten.
+
+    === Public Attributes ===
+    capacity:
+        The most scores this table holds.
+    hits:
+        The number of scores that were found in this table.
+    misses:
+        The number of scores that were not found in this table, and were
+        computed.
+
+    === Representation Invariants ===
+    - capacity >= 1
+    """
+    # === Private Attributes ===
+    # _scores:
+    #   The score of each goal type and colour on each board, keyed by the
+    #   board's grid_hash, the goal's colour and the goal's type, from the
+    #   least to the most recently used.
+    capacity: int
+    hits: int
+    misses: int
+    _scores: OrderedDict[Tuple[int, Tuple[int, int, int], type], int]
+
+    def __init__(self, capacity: int = 100000) -> None:
+        """Initialize an empty table holding up to <capacity> scores.
+
+        Precondition: capacity >= 1
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._scores = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of scores in this table.
+        """
+        return len(self._scores)
+
+    def score(self, goal: Goal, board: Block) -> int:
+        """Return goal.score(board), looking it up in this table if it has
+        been computed before.
+
+        >>> board = Block((0, 0), 750, COLOUR_LIST[0], 0, 1)
+        >>> table = TranspositionTable()
+        >>> goal = PerimeterGoal(COLOUR_LIST[0])
+        >>> table.score(goal, board) == table.score(goal, board) == 8
+        True
+        >>> table.hits, table.misses
+        (1, 1)
+        """
+        key = (board.grid_hash(), goal.colour, type(goal))
+        score = self._scores.get(key)
+        if score is not None:
+            self.hits += 1
+            self._scores.move_to_end(key)
+            return score
+
+        self.misses += 1
+        score = goal.score(board)
+        self._scores[key] = score
+        if len(self._scores) > self.capacity:
+            self._scores.popitem(last=False)
+        return score
+
+
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
         'allowed-import-modules': [
             'doctest', 'python_ta', 'random', 'typing', 'block', 'settings',
-            'math', '__future__'
+            'math', '__future__', 'itertools', 'collections'
         ],
-        'max-attributes': 15
+        'max-attributes': 15,
+        'max-locals': 25
     })
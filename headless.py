@@ -0,0 +1,110 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains functions that play games of Blocky between computer
+players without a display. Turns are played back to back, with no clock and
+no animation, and neither pygame nor the Renderer is imported, so games can
+be simulated as fast as the players can choose their moves.
+"""
+from typing import List, Optional, TextIO, Tuple
+import random
+
+from block import generate_board
+from blocky import GameData
+from player import create_players, shutdown_pools
+from replay import MoveLog
+from settings import BOARD_SIZE
+
+
+def play_game(data: GameData) -> Tuple[List[Tuple[int, int, int]], int]:
+    """Play the game in <data> until <data.max_turns> turns have been
+    played, and return each player ID, goal score, and penalty, together with
+    the ID of the winning player.
+
+    Each player moves in turn, as in MainState. A move that is not successful
+    is asked for again. If the game has a log, it is finished once the game
+    is over.
+
+    Precondition: every player in <data.players> is a RandomPlayer or a
+    SmartPlayer.
+    """
+    turn = 0
+    while turn < data.max_turns:
+        for player in data.players:
+            move_successful = False
+            while not move_successful:
+                player.proceed()
+                move = player.generate_move(data.board)
+                move_successful = data.apply_move(player, move)
+        turn += 1
+
+    if data.log is not None:
+        data.log.finish(data)
+    return data.final_scores()
+
+
+def simulate_game(max_depth: int, num_random: int, smart_players: List[int],
+                  num_turns: int, workers: int = 1,
+                  seed: Optional[int] = None,
+                  log: Optional[TextIO] = None) \
+        -> Tuple[List[Tuple[int, int, int]], int]:
+    """Play a game of <num_turns> turns on a new board with a depth of
+    <max_depth>, between <num_random> random players and a smart player of
+    each difficulty in <smart_players>, and return the result of play_game.
+
+    Each smart player scores its candidate moves with <workers> processes.
+
+    If <seed> is given, everything random in the game is drawn from random
+    number generators seeded with it, so the game can be played again from
+    <seed> alone, whatever else uses the random module. Otherwise, it is drawn
+    from the random module.
+
+    If <log> is given, the game is written to it as a move log (see
+    replay.py).
+
+    Precondition:
+        - num_random + len(smart_players) >= 1
+    """
+    rng = None if seed is None else random.Random(seed)
+    board = generate_board(max_depth, BOARD_SIZE, rng)
+    players = create_players(0, num_random, smart_players, workers, rng=rng)
+    data = GameData(board, players, rng)
+    data.max_turns = num_turns
+    if log is not None:
+        MoveLog(log).start(data, seed)
+
+    scores = play_game(data)
+    shutdown_pools()
+    return scores
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', 'random', 'block', 'blocky',
+            'player', 'replay', 'settings'
+        ],
+        'max-args': 7
+    })
+
+    # Play a game between two smart players of different difficulty.
+    print(simulate_game(3, 0, [5, 10], 5))
@@ -0,0 +1,246 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains the MoveIndex class, which keeps track of the Blocks of a
+board that each action can be performed on, so that a valid move can be drawn
+uniformly at random without searching the board for one.
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+import random
+
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PAINT, COMBINE
+from block import Block
+
+# The actions that can be performed on any Block with children.
+_PARENT_ACTIONS = [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE,
+                   SWAP_HORIZONTAL, SWAP_VERTICAL]
+
+
+class _Eligible:
+    """A set of Blocks that can be added to, removed from and indexed into in
+    constant time.
+    """
+    # === Private Attributes ===
+    # _blocks:
+    #   The Blocks in this set, in no particular order.
+    # _indices:
+    #   The index in _blocks of each Block in this set, keyed by its id.
+    _blocks: List[Block]
+    _indices: Dict[int, int]
+
+    def __init__(self) -> None:
+        """Initialize an empty set.
+        """
+        self._blocks = []
+        self._indices = {}
+
+    def __len__(self) -> int:
+        """Return the number of Blocks in this set.
+        """
+        return len(self._blocks)
+
+    def __getitem__(self, i: int) -> Block:
+        """Return the Block at index <i> of this set.
+        """
+        return self._blocks[i]
+
+    def add(self, block: Block) -> None:
+        """Add <block> to this set.
+
+        Precondition: <block> is not in this set.
+        """
+        self._indices[id(block)] = len(self._blocks)
+        self._blocks.append(block)
+
+    def discard(self, block: Block) -> None:
+        """Remove <block> from this set, if it is in it.
+
+        The last Block in this set takes its place.
+        """
+        i = self._indices.pop(id(block), None)
+        if i is not None:
+            last = self._blocks.pop()
+            if last is not block:
+                self._blocks[i] = last
+                self._indices[id(last)] = i
+
+
+class MoveIndex:
+    """The Blocks of a board that each action can be performed on, kept up to
+    date as the board changes.
+
+    Once a board has a MoveIndex, every smash, paint and combine on it (and
+    every undo of one) updates the index, in time proportional to the number
+    of Blocks it adds or removes. Swaps and rotations do not change which
+    Blocks each action can be performed on, so they leave the index alone.
+
+    === Public Attributes ===
+    board:
+        The board that this index is kept for.
+    """
+    # === Private Attributes ===
+    # _parents:
+    #   The Blocks with children, which can be rotated and swapped.
+    # _smashable:
+    #   The leaves that can be smashed.
+    # _unit_leaves:
+    #   The leaves at max_depth of each colour, which can be painted with
+    #   any other colour.
+    # _combinable:
+    #   The Blocks that can be combined.
+    board: Block
+    _parents: _Eligible
+    _smashable: _Eligible
+    _unit_leaves: Dict[Tuple[int, int, int], _Eligible]
+    _combinable: _Eligible
+
+    def __init__(self, board: Block) -> None:
+        """Initialize the index of <board>, and attach it to <board> so that
+        the changes made to <board> from now on are reported to it.
+
+        Precondition: <board> is the root of its tree.
+        """
+        self.board = board
+        self._parents = _Eligible()
+        self._smashable = _Eligible()
+        self._unit_leaves = {}
+        self._combinable = _Eligible()
+
+        pending = [board]
+        while len(pending) > 0:
+            block = pending.pop()
+            self._add(block)
+            for child in block.children:
+                # Changes are reported by walking up to the root of the tree.
+                child._parent = block
+                pending.append(child)
+        board._index = self
+
+    def _add(self, block: Block) -> None:
+        """Add <block> to the sets of the actions that can be performed on
+        it.
+
+        Precondition: <block> is not in any of the sets of this index.
+        """
+        if len(block.children) == 4:
+            self._parents.add(block)
+            if block.level == block.max_depth - 1 and \
+                    block._majority_colour() != 'None':
+                self._combinable.add(block)
+        elif block.level < block.max_depth:
+            self._smashable.add(block)
+        else:
+            if block.colour not in self._unit_leaves:
+                self._unit_leaves[block.colour] = _Eligible()
+            self._unit_leaves[block.colour].add(block)
+
+    def _discard(self, block: Block) -> None:
+        """Remove <block> from all the sets of this index.
+        """
+        self._parents.discard(block)
+        self._smashable.discard(block)
+        self._combinable.discard(block)
+        for leaves in self._unit_leaves.values():
+            leaves.discard(block)
+
+    def update(self, block: Block, removed: List[Block]) -> None:
+        """Update this index after <block> has changed, and each Block in
+        <removed> has been removed from its children, along with their
+        descendants.
+
+        <block> and all its current descendants are indexed again, as is its
+        parent, whose combine depends on the colours of its children.
+        """
+        pending = removed[:]
+        while len(pending) > 0:
+            b = pending.pop()
+            self._discard(b)
+            pending.extend(b.children)
+
+        pending = [block]
+        while len(pending) > 0:
+            b = pending.pop()
+            self._discard(b)
+            self._add(b)
+            pending.extend(b.children)
+
+        if block._parent is not None:
+            self._discard(block._parent)
+            self._add(block._parent)
+
+    def num_moves(self, colour: Tuple[int, int, int]) -> int:
+        """Return the number of valid moves on the board for a player whose
+        goal is of <colour>.
+        """
+        paintable = 0
+        for leaf_colour, leaves in self._unit_leaves.items():
+            if leaf_colour != colour:
+                paintable += len(leaves)
+        return len(_PARENT_ACTIONS) * len(self._parents) + \
+            len(self._smashable) + paintable + len(self._combinable)
+
+    def random_move(self, colour: Tuple[int, int, int],
+                    rng: Optional[random.Random] = None) -> \
+            Optional[Tuple[str, Optional[int], Block]]:
+        """Return a move drawn uniformly at random from <rng> (or from the
+        random module if it is None) among the valid moves on the board for a
+        player whose goal is of <colour>, or None if there are none.
+
+        A valid move is a move other than PASS that can be successfully
+        performed on the board.
+        """
+        if rng is None:
+            rng = random
+        num_moves = self.num_moves(colour)
+        if num_moves == 0:
+            return None
+        i = rng.randrange(num_moves)
+
+        num_parent_moves = len(_PARENT_ACTIONS) * len(self._parents)
+        if i < num_parent_moves:
+            action = _PARENT_ACTIONS[i % len(_PARENT_ACTIONS)]
+            return action[0], action[1], \
+                self._parents[i // len(_PARENT_ACTIONS)]
+        i -= num_parent_moves
+
+        if i < len(self._smashable):
+            return SMASH[0], SMASH[1], self._smashable[i]
+        i -= len(self._smashable)
+
+        for leaf_colour, leaves in self._unit_leaves.items():
+            if leaf_colour != colour:
+                if i < len(leaves):
+                    return PAINT[0], PAINT[1], leaves[i]
+                i -= len(leaves)
+
+        return COMBINE[0], COMBINE[1], self._combinable[i]
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'random',
+            'actions', 'block'
+        ]
+    })
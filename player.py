@@ -22,18 +22,62 @@ Misha Schwartz, and Jaisie Sin.
 This file contains the hierarchy of player classes.
 """
 from __future__ import annotations
-from typing import List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, \
+    TYPE_CHECKING
+from itertools import islice
+import math
+import multiprocessing
 import random
-import pygame
-
-from block import Block
-from goal import Goal, generate_goals
-
-from actions import KEY_ACTION, ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
-    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE
-
-
-def create_players(num_human: int, num_random: int, smart_players: List[int]) \
+import threading
+import time
+
+from block import Block, UndoRecord, undo
+from codec import decode, encode
+from goal import Goal, TranspositionTable, generate_goals
+from move_index import MoveIndex
+
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE, \
+    ACTION_PENALTY
+
+# pygame is only needed by players that respond to events on screen, so it
+# is imported when it is used. This lets computer players play without a
+# display.
+if TYPE_CHECKING:
+    import pygame
+
+# The process pools used by SmartPlayers to score their candidate moves in
+# parallel, keyed by their number of worker processes. A pool is started the
+# first time it is needed and kept until shutdown_pools is called, so that
+# its workers are only started once per game.
+_POOLS: Dict[int, ProcessPoolExecutor] = {}
+
+# Held while _POOLS is read or changed, since SmartPlayers that choose their
+# moves in the background start pools from their own threads.
+_POOLS_LOCK = threading.Lock()
+
+# The scores computed by this process when it is a worker of one of those
+# pools. A worker is kept for the whole game, so it finds the boards it has
+# scored for earlier moves here.
+_WORKER_TABLE = TranspositionTable()
+
+# How often, in seconds, a player choosing a move in the background checks
+# whether it has been cancelled while it waits for worker processes.
+_CANCEL_POLL = 0.05
+
+# The number of most promising moves that a SearchPlayer created by
+# create_players searches deeper at each position, and the milliseconds it
+# has to choose each move.
+_SEARCH_BEAM = 6
+_SEARCH_BUDGET = 1000
+
+
+def create_players(num_human: int, num_random: int, smart_players: List[int],
+                   workers: int = 1, goal_type: Optional[type] = None,
+                   rng: Optional[random.Random] = None,
+                   background: bool = False,
+                   search_players: Optional[List[int]] = None) \
         -> List[Player]:
     """Return a new list of Player objects.
 
@@ -45,33 +89,81 @@ def create_players(num_human: int, num_random: int, smart_players: List[int]) \
     <num_random> RandomPlayer objects, then the same number of SmartPlayer
     objects as the length of <smart_players>. The difficulty levels in
     <smart_players> should be applied to each SmartPlayer object, in order.
+    Each SmartPlayer scores its candidate moves with <workers> processes.
+    Every player's goal is of type <goal_type>, or of a random type if it is
+    None.
+
+    Goals are assigned with <rng>, or with the random module if it is None.
+    If <rng> is given, each RandomPlayer and SmartPlayer gets its own random
+    number generator, seeded from <rng>, to choose its moves with.
+    Otherwise, they choose their moves with the random module.
+
+    If <background> is True, each SmartPlayer chooses its moves in the
+    background (see SmartPlayer.background).
+
+    <search_players> is a list of search depths for each SearchPlayer that is
+    to be created after the SmartPlayers. Each SearchPlayer knows the goals
+    of all the other players, in the order they play after it.
     """
     players = []
+    players_rng = rng
+    if rng is None:
+        rng = random
+    if search_players is None:
+        search_players = []
 
-    total = num_human + num_random + len(smart_players)
-    goals = generate_goals(total)
+    total = num_human + num_random + len(smart_players) + len(search_players)
+    goals = generate_goals(total, goal_type, rng)
 
     for i in range(num_human):
-        goal = random.choice(goals)
+        goal = rng.choice(goals)
         goals.remove(goal)
         p = HumanPlayer(i, goal)
         players.append(p)
 
     for j in range(num_human, num_random + num_human):
-        goal = random.choice(goals)
+        goal = rng.choice(goals)
         goals.remove(goal)
-        p = RandomPlayer(j, goal)
+        p = RandomPlayer(j, goal, _derive_rng(players_rng))
         players.append(p)
 
     for k in range(len(smart_players)):
-        goal = random.choice(goals)
+        goal = rng.choice(goals)
         goals.remove(goal)
-        p = SmartPlayer(k + num_human + num_random, goal, smart_players[k])
+        p = SmartPlayer(k + num_human + num_random, goal, smart_players[k],
+                        workers, _derive_rng(players_rng))
+        p.background = background
         players.append(p)
 
+    for depth in search_players:
+        goal = rng.choice(goals)
+        goals.remove(goal)
+        p = SearchPlayer(len(players), goal, _SEARCH_BEAM, depth,
+                         rng=_derive_rng(players_rng),
+                         time_budget=_SEARCH_BUDGET)
+        p.background = background
+        players.append(p)
+
+    for p in players:
+        if isinstance(p, SearchPlayer):
+            p.opponents = [players[(p.id + i) % total].goal
+                           for i in range(1, total)]
+
     return players
 
 
+def _derive_rng(rng: Optional[random.Random]) -> Optional[random.Random]:
+    """Return a new random number generator seeded from <rng>, or None if
+    <rng> is None.
+
+    The new generator's stream does not depend on how much of <rng>'s stream
+    is used afterwards.
+    """
+    if rng is None:
+        return None
+    return random.Random(rng.getrandbits(64))
+
+
 def _get_block(block: Block, location: Tuple[int, int], level: int) -> \
         Optional[Block]:
     """Return the Block within <block> that is at <level> and includes
@@ -87,24 +179,168 @@ def _get_block(block: Block, location: Tuple[int, int], level: int) -> \
 
     If no Block can be found at <location>, return None.
 
+    Since sizes are rounded, a Block can reach a pixel past its parent, so
+    more than one Block may include <location>: the first one found by
+    visiting children in order is returned. Only the children whose Blocks
+    down to <level> can reach <location> are visited, which away from the
+    edges of Blocks is the one child in whose quadrant <location> lies.
+
     Preconditions:
         - 0 <= level <= max_depth
     """
-    x, y = block.position[0], block.position[1]
-    size = block.size
-    within_bounds = x <= location[0] < x + size and y <= location[1] < y + size
-    if (block.level == level and within_bounds) or \
-            (block.children == [] and within_bounds and block.level < level):
-        return block
-    elif block.level > level:
-        return None
-    else:
-        for child in block.children:
-            b = _get_block(child, location, level)
-            if b is not None:
-                return b
+    return _get_blocks(block, [(location, level)])[0]
+
+
+# The furthest that a Block reaches to the right of (and below) its position,
+# counting its descendants down to some number of levels below it, by its size
+# and that number of levels.
+_REACH: Dict[Tuple[int, int], int] = {}
+
+
+def _reach(size: int, levels: int) -> int:
+    """Return how far to the right of (and below) its position a Block of
+    <size> reaches, counting its descendants down to <levels> below it.
+
+    Its lower-right child reaches the furthest, and is half its size (rounded)
+    to the right of (and below) it.
+    """
+    key = (size, levels)
+    if key not in _REACH:
+        if levels == 0:
+            _REACH[key] = size
+        else:
+            half = round(size / 2.0)
+            _REACH[key] = max(size, half + _reach(half, levels - 1))
+    return _REACH[key]
 
-    return None
+
+def _get_blocks(board: Block,
+                queries: List[Tuple[Tuple[int, int], int]]) -> \
+        List[Optional[Block]]:
+    """Return the result of _get_block(<board>, location, level) for each
+    (location, level) in <queries>, in order.
+
+    The queries are resolved together in a single pass down <board>: each
+    Block is visited once for all the queries that reach it, rather than once
+    per query.
+    """
+    results = [None] * len(queries)
+    resolved = [False] * len(queries)
+    pending = [(board, board.position,
+                [i for i in range(len(queries))
+                 if queries[i][1] >= board.level])]
+    while len(pending) > 0:
+        block, (x, y), indices = pending.pop()
+        # The queries that are still looking below this Block.
+        below = []
+        for i in indices:
+            if resolved[i]:
+                # Resolved by a Block visited earlier.
+                continue
+            location, level = queries[i]
+            if x <= location[0] < x + block.size and \
+                    y <= location[1] < y + block.size and \
+                    (block.level == level or len(block.children) == 0):
+                results[i] = block
+                resolved[i] = True
+            elif block.level < level and len(block.children) == 4:
+                below.append(i)
+        if len(below) == 0:
+            continue
+
+        positions = block._children_positions((x, y))
+        half = block._child_size()
+        for j in range(3, -1, -1):
+            # Pushed in reverse, so that the children are visited in order.
+            reaching = _reaching(queries, below, positions[j], half,
+                                 block.level + 1)
+            if len(reaching) > 0:
+                pending.append((block.children[j], positions[j], reaching))
+    return results
+
+
+def _reaching(queries: List[Tuple[Tuple[int, int], int]], indices: List[int],
+              position: Tuple[int, int], size: int, level: int) -> List[int]:
+    """Return the indices in <indices> of the (location, level) queries in
+    <queries> whose location is reached by a Block at <position> with <size>
+    and <level>, counting its descendants down to the level of the query.
+    """
+    x, y = position
+    reaching = []
+    for i in indices:
+        location, query_level = queries[i]
+        reach = _reach(size, query_level - level)
+        if x <= location[0] < x + reach and y <= location[1] < y + reach:
+            reaching.append(i)
+    return reaching
+
+
+def shutdown_pools() -> None:
+    """Stop the worker processes that SmartPlayers have started to score
+    their candidate moves in parallel.
+
+    The moves that the workers have not started scoring yet are dropped, and
+    this function returns without waiting for the workers to exit.
+    """
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _score_move(board: Block, goal: Goal, block: Block,
+                move: Tuple[str, Optional[int]], seed: int,
+                table: Optional[TranspositionTable] = None) -> int:
+    """Return the score of <goal> on <board> when <move> is performed on
+    <block>, without mutating <board>, looking it up in <table> if it is
+    given.
+
+    The score is computed on a copy of <board> that shares every subtree
+    except the path down to <block>. If <move> is a smash, <seed> seeds the
+    random children it creates, so that the score does not depend on which
+    process computes it, and no other random number generator is used.
+    """
+    moves_descendants = move in [SWAP_HORIZONTAL, SWAP_VERTICAL,
+                                 ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE]
+    board_copy, block_copy = board.path_copy(block, moves_descendants)
+    if move == SWAP_HORIZONTAL:
+        block_copy.swap(SWAP_HORIZONTAL[1])
+    elif move == SWAP_VERTICAL:
+        block_copy.swap(SWAP_VERTICAL[1])
+    elif move == SMASH:
+        block_copy.smash(rng=random.Random(seed))
+    elif move == PAINT:
+        block_copy.paint(goal.colour)
+    elif move == ROTATE_CLOCKWISE:
+        block_copy.rotate(ROTATE_CLOCKWISE[1])
+    elif move == ROTATE_COUNTER_CLOCKWISE:
+        block_copy.rotate(ROTATE_COUNTER_CLOCKWISE[1])
+    elif move == COMBINE:
+        block_copy.combine()
+    if table is None:
+        return goal.score(board_copy)
+    return table.score(goal, board_copy)
+
+
+def _score_moves(board: bytes, goal: Goal,
+                 moves: List[Tuple[List[int], str, Optional[int], int]]) \
+        -> List[int]:
+    """Return the scores of <goal> on <board> when each of <moves> is
+    performed on it, in order.
+
+    This is run by the worker processes of a pool. <board> is given in the
+    encoding of codec.encode, and each move is given as the path down to the
+    Block it is performed on (see Block._path_to), its action, its direction,
+    and the seed for _score_move. Scores are looked up in this process's table.
+    """
+    block_board = decode(board)
+    scores = []
+    for path, action, direction, seed in moves:
+        block = block_board._follow(path)
+        scores.append(_score_move(block_board, goal, block,
+                                  (action, direction), seed, _WORKER_TABLE))
+    return scores
 
 
 class Player:
@@ -152,6 +388,17 @@ class Player:
         """
         raise NotImplementedError
 
+    def thinking(self) -> bool:
+        """Return True iff this player is choosing a move in the background.
+        """
+        return False
+
+    def cancel(self) -> None:
+        """Stop choosing a move in the background, if this player is choosing
+        one.
+        """
+        return
+
 
 def _create_move(action: Tuple[str, Optional[int]], block: Block) -> \
         Tuple[str, Optional[int], Block]:
@@ -175,6 +422,11 @@ class HumanPlayer(Player):
     #     The level of the Block that the user selected most recently.
     # _desired_action:
     #     The most recent action that the user is attempting to do.
+    # _hover_key:
+    #     The mouse position, level, board and version of the board that
+    #     the block selected most recently was found for, or None.
+    # _hover_block:
+    #     The block selected most recently.
     #
     # == Representation Invariants concerning the private attributes ==
     #     _level >= 0
@@ -182,6 +434,8 @@ class HumanPlayer(Player):
     goal: Goal
     _level: int
     _desired_action: Optional[Tuple[str, Optional[int]]]
+    _hover_key: Optional[Tuple[Tuple[int, int], int, int, int]]
+    _hover_block: Optional[Block]
 
     def __init__(self, player_id: int, goal: Goal) -> None:
         """Initialize this HumanPlayer with the given, <player_id> and <goal>.
@@ -192,23 +446,37 @@ class HumanPlayer(Player):
         # and _desired_action to None.
         self._level = 0
         self._desired_action = None
+        self._hover_key = None
+        self._hover_block = None
 
     def get_selected_block(self, board: Block) -> Optional[Block]:
         """Return the block that is currently selected by the player based on
         the position of the mouse on the screen and the player's desired level.
 
         If no block is selected by the player, return None.
+
+        This is called every frame, so the block is only looked up again when
+        the mouse, the level or the board has changed since the last call.
         """
+        import pygame
+
         mouse_pos = pygame.mouse.get_pos()
-        block = _get_block(board, mouse_pos, min(self._level, board.max_depth))
+        level = min(self._level, board.max_depth)
+        key = (mouse_pos, level, id(board), board._version)
+        if key != self._hover_key:
+            self._hover_block = _get_block(board, mouse_pos, level)
+            self._hover_key = key
 
-        return block
+        return self._hover_block
 
     def process_event(self, event: pygame.event.Event) -> None:
         """Respond to the relevant keyboard events made by the player based on
         the mapping in KEY_ACTION, as well as the W and S keys for changing
         the level.
         """
+        import pygame
+        from actions import KEY_ACTION
+
         if event.type == pygame.KEYDOWN:
             if event.key in KEY_ACTION:
                 self._desired_action = KEY_ACTION[event.key]
@@ -237,47 +505,181 @@ class HumanPlayer(Player):
             return move
 
 
-def _generate_random_valid_moves(board: Block, goal: Goal) -> \
+def _generate_random_valid_moves(board: Block, goal: Goal,
+                                 rng: Optional[random.Random] = None) -> \
         Optional[Tuple[str, Optional[int], Block]]:
-    """Return a randomly generated, valid move.
+    """Return a valid move drawn uniformly at random with <rng>, or with the
+    random module if it is None.
 
     A valid move is a move other than PASS that can be successfully performed
     on the <board>.
 
+    The move is drawn in constant time from the MoveIndex of <board>, which
+    is created the first time it is needed and kept up to date by <board>
+    after that.
+
     This function does not mutate <board>.
+
+    Precondition: <board> is the root of its tree, and has a valid move.
     """
-    x = random.randint(board.position[0], board.position[0] + board.size - 1)
-    y = random.randint(board.position[1], board.position[1] + board.size - 1)
-    level = random.randint(0, board.max_depth)
-    block = None
-    while block is None:
-        block = _get_block(board, (x, y), level)
-    actions_ = [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, SWAP_HORIZONTAL,
-                SWAP_VERTICAL, SMASH, PAINT, COMBINE]
-
-    b = block.create_copy()
-    move = random.choice(actions_)
-    valid_move = False
-
-    if move == SMASH:
-        valid_move = b.smash()
-    elif move == SWAP_VERTICAL:
-        valid_move = b.swap(SWAP_VERTICAL[1])
-    elif move == SWAP_HORIZONTAL:
-        valid_move = b.swap(SWAP_HORIZONTAL[1])
-    elif move == ROTATE_COUNTER_CLOCKWISE:
-        valid_move = b.rotate(ROTATE_COUNTER_CLOCKWISE[1])
-    elif move == ROTATE_CLOCKWISE:
-        valid_move = b.rotate(ROTATE_CLOCKWISE[1])
-    elif move == COMBINE:
-        valid_move = b.combine()
-    elif move == PAINT:
-        valid_move = b.paint(goal.colour)
+    index = board._index
+    if index is None:
+        index = MoveIndex(board)
+    return index.random_move(goal.colour, rng)
+
+
+# The actions that can be performed on a Block, in the order in which
+# _valid_moves tries them.
+_ACTIONS = [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, SWAP_HORIZONTAL,
+            SWAP_VERTICAL, SMASH, PAINT, COMBINE]
+
+# SmartPlayers that only try distinct moves try every move on boards with a
+# max_depth of at most this, and a sample of them on deeper boards.
+_EXHAUSTIVE_DEPTH = 3
+
 
-    if valid_move:
-        return _create_move(move, block)
+def _changes_board(board: Block, goal: Goal, block: Block,
+                   action: Tuple[str, Optional[int]]) -> bool:
+    """Return True iff performing <action> on <block> for <goal> succeeds
+    and changes the unit cells of <board>.
+
+    A smash is assumed to change them, since its result is random. A rotate,
+    swap or combine is performed and undone to compare the unit cells, so
+    <board> is left as it was.
+
+    Precondition: <block> is <board> or one of its descendants.
+    """
+    if action == SMASH:
+        return block.smashable()
+    elif action == PAINT:
+        return len(block.children) == 0 and \
+            block.level == block.max_depth and block.colour != goal.colour
+
+    before = board.grid_hash()
+    journal = []
+    if action == COMBINE:
+        block.combine(journal)
+    elif action in [SWAP_HORIZONTAL, SWAP_VERTICAL]:
+        block.swap(action[1], journal)
     else:
-        return _generate_random_valid_moves(board, goal)
+        block.rotate(action[1], journal)
+    changed = len(journal) > 0 and board.grid_hash() != before
+    undo(journal)
+    return changed
+
+
+def _valid_moves(board: Block, goal: Goal,
+                 rng: Optional[random.Random] = None) -> \
+        Iterator[Tuple[str, Optional[int], Block]]:
+    """Return an iterator over every distinct valid move on <board> for
+    <goal> that changes its unit cells.
+
+    The moves are found lazily, one (action, block) pair at a time. Without
+    <rng>, the Blocks of <board> are visited in pre-order and each action is
+    tried in the order of _ACTIONS. With <rng>, the pairs are visited in a
+    random order drawn from it, so that taking the first k moves samples k
+    moves without replacement.
+
+    <board> must not be changed while the iterator is in use, and is left as
+    it was.
+    """
+    blocks = []
+    pending = [board]
+    while len(pending) > 0:
+        block = pending.pop()
+        blocks.append(block)
+        pending.extend(reversed(block.children))
+
+    num_pairs = len(blocks) * len(_ACTIONS)
+    order = list(range(num_pairs))
+    for i in range(num_pairs):
+        if rng is not None:
+            # Draw the i-th pair from those not drawn yet.
+            j = rng.randrange(i, num_pairs)
+            order[i], order[j] = order[j], order[i]
+        block = blocks[order[i] // len(_ACTIONS)]
+        action = _ACTIONS[order[i] % len(_ACTIONS)]
+        if _changes_board(board, goal, block, action):
+            yield _create_move(action, block)
+
+
+class _Thinker:
+    """A move being chosen on a worker thread, on a copy of the board, so
+    that the thread that asked for it is not blocked.
+
+    === Public Attributes ===
+    cancelled:
+        Set to stop choosing the move.
+    """
+    # === Private Attributes ===
+    # _thread:
+    #   The thread choosing the move.
+    # _move:
+    #   The move chosen on the copy, with the path of child indices down to
+    #   its block in place of the block, or None if it has not been chosen.
+    # _error:
+    #   The exception raised while choosing the move, or None.
+    cancelled: threading.Event
+    _thread: threading.Thread
+    _move: Optional[Tuple[str, Optional[int], List[int]]]
+    _error: Optional[BaseException]
+
+    def __init__(self, choose: Callable[[Block, threading.Event],
+                                        Optional[Tuple[str, Optional[int],
+                                                       Block]]],
+                 board: Block) -> None:
+        """Start choosing a move on a copy of <board>, by calling <choose>
+        with the copy and the event that cancels it.
+
+        Precondition: <board> does not change until the move is chosen.
+        """
+        self.cancelled = threading.Event()
+        self._move = None
+        self._error = None
+        # A daemon thread does not keep the game running once it is closed.
+        self._thread = threading.Thread(target=self._run,
+                                        args=(choose, board), daemon=True)
+        self._thread.start()
+
+    def _run(self, choose: Callable[[Block, threading.Event],
+                                    Optional[Tuple[str, Optional[int],
+                                                   Block]]],
+             board: Block) -> None:
+        """Choose the move with <choose> on a copy of <board>, keeping any
+        exception raised.
+
+        The copy is made on this thread rather than when the move is asked
+        for, so that copying a large board does not hold up the thread that
+        asked.
+        """
+        try:
+            copy = board.create_copy()
+            move = choose(copy, self.cancelled)
+            if move is not None:
+                self._move = move[0], move[1], copy._path_to(move[2])
+        except BaseException as error:
+            self._error = error
+
+    def done(self) -> bool:
+        """Return True iff the move has been chosen, or choosing it failed.
+        """
+        return not self._thread.is_alive()
+
+    def result(self, board: Block) -> \
+            Optional[Tuple[str, Optional[int], Block]]:
+        """Return the move chosen, performed on <board> rather than on the
+        copy of it, or None if it was cancelled.
+
+        Raise the exception raised while choosing the move, if any.
+
+        Precondition: self.done() and <board> has not changed since the move
+        started being chosen.
+        """
+        if self._error is not None:
+            raise self._error
+        if self._move is None:
+            return None
+        return self._move[0], self._move[1], board._follow(self._move[2])
 
 
 class RandomPlayer(Player):
@@ -293,18 +695,25 @@ class RandomPlayer(Player):
     # _proceed:
     #   True when the player should make a move, False when the player should
     #   wait.
+    # _rng:
+    #   The random number generator this player chooses its moves with, or
+    #   None if it uses the random module.
     id: int
     goal: Goal
     _proceed: bool
+    _rng: Optional[random.Random]
 
-    def __init__(self, player_id: int, goal: Goal) -> None:
+    def __init__(self, player_id: int, goal: Goal,
+                 rng: Optional[random.Random] = None) -> None:
         """Initialise this random player with the given <player_id> and
-        <goal>.
+        <goal>, choosing its moves with <rng>, or with the random module if it
+        is None.
 
         Initially, _proceed is set to False as it is not the player's turn.
         """
         Player.__init__(self, player_id, goal)
         self._proceed = False
+        self._rng = rng
 
     def get_selected_block(self, board: Block) -> Optional[Block]:
         """Return the block on the <board> that has been selected.
@@ -319,8 +728,16 @@ class RandomPlayer(Player):
         """Respond to the clicking of the mouse on the game board by
         making it the random player's turn.
         """
+        import pygame
+
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            self._proceed = True
+            self.proceed()
+
+    def proceed(self) -> None:
+        """Make it this player's turn, so that its next call to
+        generate_move returns a move.
+        """
+        self._proceed = True
 
     def generate_move(self, board: Block) ->\
             Optional[Tuple[str, Optional[int], Block]]:
@@ -334,7 +751,7 @@ class RandomPlayer(Player):
         if not self._proceed:
             return None  # Do not remove
 
-        move = _generate_random_valid_moves(board, self.goal)
+        move = _generate_random_valid_moves(board, self.goal, self._rng)
 
         self._proceed = False  # Must set to False before returning!
 
@@ -351,28 +768,83 @@ class SmartPlayer(Player):
         This smart player's assigned goal for the game.
     difficulty:
         The difficulty level of this smart player.
+    workers:
+        The number of processes this smart player scores its candidate moves
+        with. If it is 1, they are scored in this process.
+    table:
+        The scores this smart player has computed in this process, so that it
+        does not score a board it has seen before again.
+    distinct:
+        If True, this smart player only tries distinct moves that change the
+        board: all of them on small boards, and <difficulty> of them sampled
+        without replacement on larger boards. Otherwise, it tries
+        <difficulty> random valid moves, which may repeat.
+    background:
+        If True, this smart player chooses its moves on a worker thread, and
+        generate_move returns None until the move is ready, so that a game
+        on screen keeps responding while it thinks. Otherwise, generate_move
+        returns once the move is chosen.
+    time_budget:
+        The number of milliseconds this smart player has to choose a move,
+        or None if it tries <difficulty> moves however long it takes. With a
+        budget, it tries moves, one at a time and in this process, until the
+        budget is spent, and makes the best move it found by then.
+    candidates:
+        The number of moves this smart player tried when it last chose a
+        move.
     """
     # === Private Attributes ===
     # _proceed:
     #   True when the player should make a move, False when the player should
     #   wait.
+    # _rng:
+    #   The random number generator this player chooses its moves with, or
+    #   None if it uses the random module.
+    # _thinker:
+    #   The move being chosen in the background, or None.
     id: int
     goal: Goal
     difficulty: int
+    workers: int
+    table: TranspositionTable
+    distinct: bool
+    background: bool
+    time_budget: Optional[int]
+    candidates: int
     _proceed: bool
-
-    def __init__(self, player_id: int, goal: Goal, difficulty: int) -> None:
-        """Initialise this smart player with <player_id>, <goal>, and
-        <difficulty>.
+    _rng: Optional[random.Random]
+    _thinker: Optional[_Thinker]
+
+    def __init__(self, player_id: int, goal: Goal, difficulty: int,
+                 workers: int = 1, rng: Optional[random.Random] = None,
+                 distinct: bool = False,
+                 time_budget: Optional[int] = None) -> None:
+        """Initialise this smart player with <player_id>, <goal>,
+        <difficulty>, and the number of <workers> to score moves with. It
+        chooses its moves with <rng>, or with the random module if it is None,
+        only tries distinct moves iff <distinct>, and has <time_budget>
+        milliseconds to choose each move, if it is not None.
 
         Difficulty determines the number of moves this smart player will try
-        before deciding on a move that yields the highest score.
+        before deciding on a move that yields the highest score, unless it
+        has a time budget.
 
-        Precondition: difficulty > 0
+        Preconditions:
+            - difficulty > 0
+            - workers > 0
+            - time_budget is None or time_budget >= 0
         """
         Player.__init__(self, player_id, goal)
         self.difficulty = difficulty
+        self.workers = workers
+        self.table = TranspositionTable()
+        self.distinct = distinct
+        self.background = False
+        self.time_budget = time_budget
+        self.candidates = 0
         self._proceed = False
+        self._rng = rng
+        self._thinker = None
 
     def get_selected_block(self, board: Block) -> Optional[Block]:
         """Return the block on the <board> that has been selected.
@@ -387,33 +859,97 @@ class SmartPlayer(Player):
         """Respond to the clicking of the mouse on the game board by
         making it the random player's turn.
         """
+        import pygame
+
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            self._proceed = True
+            self.proceed()
+
+    def proceed(self) -> None:
+        """Make it this player's turn, so that its next call to
+        generate_move returns a move.
+        """
+        self._proceed = True
 
     def _get_score(self, board: Block, block: Block,
-                   move: Tuple[str, Optional[int]]) -> int:
+                   move: Tuple[str, Optional[int]], seed: int) -> int:
         """Return the score of <board> when <move> is performed on the
-        given block.
-
-        The scoring is done using the score() method for <self.goal>.
-        """
-        board_copy = board.create_copy()
-        block_copy = _get_block(board_copy, block.position, block.level)
-        if move == SWAP_HORIZONTAL:
-            block_copy.swap(SWAP_HORIZONTAL[1])
-        elif move == SWAP_VERTICAL:
-            block_copy.swap(SWAP_VERTICAL[1])
-        elif move == SMASH:
-            block_copy.smash()
-        elif move == PAINT:
-            block_copy.paint(self.goal.colour)
-        elif move == ROTATE_CLOCKWISE:
-            block_copy.rotate(ROTATE_CLOCKWISE[1])
-        elif move == ROTATE_COUNTER_CLOCKWISE:
-            block_copy.rotate(ROTATE_COUNTER_CLOCKWISE[1])
-        elif move == COMBINE:
-            block_copy.combine()
-        return self.goal.score(board_copy)
+        given block, smashing with <seed> if <move> is a smash.
+
+        The scoring is done using the score() method for <self.goal>, without
+        mutating <board>.
+        """
+        return _score_move(board, self.goal, block, move, seed, self.table)
+
+    def _get_scores(self, board: Block,
+                    moves: List[Tuple[str, Optional[int], Block]],
+                    seeds: List[int],
+                    cancelled: Optional[threading.Event] = None) -> List[int]:
+        """Return the scores of <board> when each of <moves> is performed on
+        it, smashing with the corresponding seed in <seeds>.
+
+        If this player has more than one worker, the moves are split into one
+        chunk per worker, and each worker is sent the board once, in the
+        encoding of codec.encode, together with its chunk.
+
+        If <cancelled> is set before all the moves are scored, the scores of
+        the rest are not computed, so fewer scores than moves are returned.
+        """
+        if self.workers == 1 or len(moves) <= 1:
+            scores = []
+            for move, seed in zip(moves, seeds):
+                if cancelled is not None and cancelled.is_set():
+                    break
+                scores.append(self._get_score(board, move[2],
+                                              (move[0], move[1]), seed))
+            return scores
+
+        with _POOLS_LOCK:
+            # A player is cancelled before the pools are shut down, so once
+            # it is cancelled, a pool it started would never be shut down.
+            if cancelled is not None and cancelled.is_set():
+                return []
+            if self.workers not in _POOLS:
+                # Workers are spawned rather than forked, so that they never
+                # inherit the state of the game's display or of its threads.
+                _POOLS[self.workers] = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context('spawn'))
+            pool = _POOLS[self.workers]
+
+        encoded = encode(board)
+        chunk_size = math.ceil(len(moves) / self.workers)
+        futures = []
+        for i in range(0, len(moves), chunk_size):
+            chunk = [(board._path_to(move[2]), move[0], move[1], seed)
+                     for move, seed in zip(moves[i:i + chunk_size],
+                                           seeds[i:i + chunk_size])]
+            futures.append(pool.submit(_score_moves, encoded, self.goal,
+                                       chunk))
+
+        while cancelled is not None and \
+                len(wait(futures, _CANCEL_POLL).not_done) > 0:
+            if cancelled.is_set():
+                for future in futures:
+                    future.cancel()
+                return []
+
+        scores = []
+        for future in futures:
+            scores.extend(future.result())
+        return scores
+
+    def thinking(self) -> bool:
+        """Return True iff this player is choosing a move in the background.
+        """
+        return self._thinker is not None
+
+    def cancel(self) -> None:
+        """Stop choosing a move in the background, if this player is choosing
+        one.
+        """
+        if self._thinker is not None:
+            self._thinker.cancelled.set()
+            self._thinker = None
 
     def generate_move(self, board: Block) ->\
             Optional[Tuple[str, Optional[int], Block]]:
@@ -425,37 +961,409 @@ class SmartPlayer(Player):
         performed on the <board>. If no move can be found that is better than
         the current score, this player will pass.
 
+        If this player chooses its moves in the background, the first call
+        starts choosing the move, and None is returned until a later call
+        finds it chosen.
+
         This function does not mutate <board>.
         """
         if not self._proceed:
             return None  # Do not remove
 
-        curr_score = self.goal.score(board.create_copy())
+        if not self.background:
+            move = self._choose_move(board)
+        else:
+            if self._thinker is None:
+                self._thinker = _Thinker(self._choose_move, board)
+            if not self._thinker.done():
+                return None
+            thinker = self._thinker
+            self._thinker = None
+            move = thinker.result(board)
 
-        valid_moves = []
+        self._proceed = False  # Must set to False before returning!
+
+        return move
 
-        for _ in range(self.difficulty):
-            move = _generate_random_valid_moves(board, self.goal)
-            valid_moves.append(move)
+    def _choose_move(self, board: Block,
+                     cancelled: Optional[threading.Event] = None) -> \
+            Optional[Tuple[str, Optional[int], Block]]:
+        """Return the move that generate_move makes on <board>, or None if
+        <cancelled> is set before it is chosen.
+        """
+        if self.time_budget is not None:
+            return self._choose_move_in_time(board, cancelled)
 
-        scores = []
+        curr_score = self.table.score(self.goal, board)
 
-        for move in valid_moves:
-            block_ = move[2]
-            m = (move[0], move[1])
-            s = self._get_score(board, block_, m)
-            scores.append(s)
+        valid_moves = []
+
+        rng = random if self._rng is None else self._rng
+        if self.distinct and board.max_depth <= _EXHAUSTIVE_DEPTH:
+            valid_moves = list(_valid_moves(board, self.goal))
+        elif self.distinct:
+            valid_moves = list(islice(_valid_moves(board, self.goal, rng),
+                                      self.difficulty))
+        else:
+            for _ in range(self.difficulty):
+                move = _generate_random_valid_moves(board, self.goal, rng)
+                valid_moves.append(move)
+
+        seeds = [rng.getrandbits(32) for _ in valid_moves]
+        scores = self._get_scores(board, valid_moves, seeds, cancelled)
+        if cancelled is not None and cancelled.is_set():
+            return None
+        self.candidates = len(scores)
 
         scores.append(curr_score)
         max_ = max(scores)
 
-        self._proceed = False  # Must set to False before returning!
-
         if max_ == curr_score:
             return PASS[0], PASS[1], board
         else:
             return valid_moves[scores.index(max_)]
 
+    def _choose_move_in_time(self, board: Block,
+                             cancelled: Optional[threading.Event] = None) \
+            -> Optional[Tuple[str, Optional[int], Block]]:
+        """Return the best move found on <board> within this player's time
+        budget, or None if <cancelled> is set before the budget is spent.
+
+        Moves are tried one at a time, in the order generate_move would
+        sample them, until the budget is spent or there are no more distinct
+        moves to try. At least one move is tried, if there is one. The best
+        move so far is kept, starting from passing.
+
+        The budget starts once <board> has been scored and indexed, so that it
+        is spent on trying moves however large <board> is.
+        """
+        rng = random if self._rng is None else self._rng
+        if self.distinct and board.max_depth <= _EXHAUSTIVE_DEPTH:
+            moves = _valid_moves(board, self.goal)
+        elif self.distinct:
+            moves = _valid_moves(board, self.goal, rng)
+        else:
+            if board._index is None:
+                MoveIndex(board)
+            moves = iter(lambda: _generate_random_valid_moves(board, self.goal,
+                                                              rng), None)
+
+        best_score = self.table.score(self.goal, board)
+        best_move = PASS[0], PASS[1], board
+        self.candidates = 0
+        deadline = time.perf_counter() + self.time_budget / 1000
+        for move in moves:
+            if self.candidates > 0 and time.perf_counter() >= deadline:
+                break
+            if cancelled is not None and cancelled.is_set():
+                return None
+            score = self._get_score(board, move[2], (move[0], move[1]),
+                                    rng.getrandbits(32))
+            self.candidates += 1
+            if score > best_score:
+                best_score = score
+                best_move = move
+
+        return best_move
+
+
+class _SearchTimeout(Exception):
+    """Raised when a search runs out of time, or is cancelled."""
+    pass
+
+
+class _Search:
+    """A lookahead search from a position on a board, which is changed in
+    place as moves are searched and changed back as they are undone.
+
+    The players are numbered by the order they move in from the position, so
+    that player 0 is the player searching.
+
+    === Public Attributes ===
+    board:
+        The board being searched.
+    goals:
+        The goal of each player.
+    penalties:
+        The penalty of each player for the moves currently made on <board>.
+    nodes:
+        The number of moves made on <board> so far.
+    """
+    # === Private Attributes ===
+    # _table:
+    #   The scores of the goals on the boards reached so far.
+    # _beam:
+    #   The number of most promising moves searched deeper at a position.
+    # _journal:
+    #   The records that undo the moves currently made on <board>.
+    # _marks:
+    #   The length of <_journal> before each move currently made on <board>,
+    #   in the order they were made.
+    # _seed:
+    #   The seed that every smash draws its new children from, so that a
+    #   smash done again gives the same children.
+    # _deadline:
+    #   The time.perf_counter() time the search must stop by, or None.
+    # _cancelled:
+    #   Set to stop the search, or None.
+    board: Block
+    goals: List[Goal]
+    penalties: List[int]
+    nodes: int
+    _table: TranspositionTable
+    _beam: int
+    _journal: List[UndoRecord]
+    _marks: List[int]
+    _seed: int
+    _deadline: Optional[float]
+    _cancelled: Optional[threading.Event]
+
+    def __init__(self, board: Block, goals: List[Goal],
+                 table: TranspositionTable, beam: int, seed: int,
+                 deadline: Optional[float] = None,
+                 cancelled: Optional[threading.Event] = None) -> None:
+        """Initialize a search on <board> for players with <goals>, scoring
+        with <table>, searching <beam> moves deeper at each position, and
+        smashing with <seed>, until <deadline> or until <cancelled> is set.
+        """
+        self.board = board
+        self.goals = goals
+        self.penalties = [0] * len(goals)
+        self.nodes = 0
+        self._table = table
+        self._beam = beam
+        self._journal = []
+        self._marks = []
+        self._seed = seed
+        self._deadline = deadline
+        self._cancelled = cancelled
+
+    def utility(self) -> int:
+        """Return the score of player 0 on the board less the best score of
+        the other players, where each score is net of the penalties of the
+        moves made.
+        """
+        scores = [self._table.score(goal, self.board) - penalty
+                  for goal, penalty in zip(self.goals, self.penalties)]
+        if len(scores) == 1:
+            return scores[0]
+        return scores[0] - max(scores[1:])
+
+    def apply(self, move: Tuple[str, Optional[int], Block],
+              player: int) -> bool:
+        """Make <move> for <player> on the board, and return True iff it
+        changes the board's unit cells (or is a smash).
+
+        If it does not, the board is left as it was. Passing is not made.
+        """
+        action = (move[0], move[1])
+        block = move[2]
+        mark = len(self._journal)
+        before = self.board.grid_hash()
+        if action == SMASH:
+            block.smash(self._journal, random.Random(self._seed))
+        elif action == PAINT:
+            block.paint(self.goals[player].colour, self._journal)
+        elif action == COMBINE:
+            block.combine(self._journal)
+        elif action in [SWAP_HORIZONTAL, SWAP_VERTICAL]:
+            block.swap(action[1], self._journal)
+        elif action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE]:
+            block.rotate(action[1], self._journal)
+        if len(self._journal) == mark or \
+                (action != SMASH and self.board.grid_hash() == before):
+            undo(self._journal, mark)
+            return False
+        self._marks.append(mark)
+        self.penalties[player] += ACTION_PENALTY[action]
+        self.nodes += 1
+        return True
+
+    def undo(self, move: Tuple[str, Optional[int], Block],
+             player: int) -> None:
+        """Undo <move>, the last move made for <player> by apply.
+        """
+        undo(self._journal, self._marks.pop())
+        self.penalties[player] -= ACTION_PENALTY[(move[0], move[1])]
+
+    def undo_all(self) -> None:
+        """Undo every move made on the board, most recent first.
+        """
+        undo(self._journal)
+        self._marks = []
+        self.penalties = [0] * len(self.goals)
+
+    def moves(self, player: int) -> \
+            List[Tuple[int, Tuple[str, Optional[int], Block]]]:
+        """Return the utility after each move of <player> that changes the
+        board's unit cells, and after passing, together with the move, best
+        first for <player>.
+
+        Player 0 wants the highest utility, and the other players the lowest.
+        Moves of equal utility are kept in the order of _valid_moves, after
+        passing.
+
+        Raise a _SearchTimeout if the search must stop.
+        """
+        if self._cancelled is not None and self._cancelled.is_set() or \
+                self._deadline is not None and \
+                time.perf_counter() >= self._deadline:
+            raise _SearchTimeout
+
+        blocks = []
+        pending = [self.board]
+        while len(pending) > 0:
+            block = pending.pop()
+            blocks.append(block)
+            pending.extend(reversed(block.children))
+
+        moves = [(self.utility(), _create_move(PASS, self.board))]
+        for block in blocks:
+            for action in _ACTIONS:
+                move = _create_move(action, block)
+                if self.apply(move, player):
+                    moves.append((self.utility(), move))
+                    self.undo(move, player)
+        moves.sort(key=lambda item: item[0], reverse=player == 0)
+        return moves
+
+    def value(self, player: int, plies: int, alpha: float,
+              beta: float) -> int:
+        """Return the utility of the board with <player> to move, searching
+        <plies> moves ahead with alpha-beta pruning between <alpha> and
+        <beta>.
+
+        Precondition: plies >= 1
+        """
+        moves = self.moves(player)
+        if plies == 1:
+            return moves[0][0]
+
+        next_player = (player + 1) % len(self.goals)
+        best = None
+        for _, move in moves[:self._beam]:
+            if move[0] != PASS[0]:
+                self.apply(move, player)
+            value = self.value(next_player, plies - 1, alpha, beta)
+            if move[0] != PASS[0]:
+                self.undo(move, player)
+
+            if player == 0:
+                best = value if best is None else max(best, value)
+                alpha = max(alpha, value)
+            else:
+                best = value if best is None else min(best, value)
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+        return best
+
+
+class SearchPlayer(SmartPlayer):
+    """A smart player that looks several moves ahead, assuming that each of
+    its opponents plays to its own goal.
+
+    It searches the moves of every player in turn with alpha-beta pruning,
+    maximizing the margin between its score and the best of its opponents'
+    scores, each net of the penalties of the moves searched. With one
+    opponent, this is the same as the opponent maximizing its own margin;
+    with more, every opponent is assumed to play against this player.
+
+    At every position, the moves are ordered by the margin one move ahead,
+    best first for the player to move, and only the <difficulty> most
+    promising ones are searched deeper. The search is deepened one move at a
+    time up to <depth>, ordering this player's moves by the last search, and
+    stops once the time budget, if any, is spent, making the best move of the
+    deepest search that finished. Moves are searched in this process.
+
+    === Public Attributes ===
+    depth:
+        The number of moves this player looks ahead, including its own.
+    opponents:
+        The goals of the other players, in the order they play after this
+        player.
+    stats:
+        For the last move this player chose, the number of moves it made
+        while searching ('nodes'), the number of moves ahead of the deepest
+        search that finished ('depth'), and the milliseconds it took ('ms').
+    """
+    depth: int
+    opponents: List[Goal]
+    stats: Dict[str, float]
+
+    def __init__(self, player_id: int, goal: Goal, difficulty: int,
+                 depth: int, opponents: Optional[List[Goal]] = None,
+                 rng: Optional[random.Random] = None,
+                 time_budget: Optional[int] = None) -> None:
+        """Initialise this search player with <player_id>, <goal>,
+        <difficulty>, the <depth> to search to, and the goals of its
+        <opponents>, in the order they play after it. It smashes with seeds
+        drawn from <rng>, or from the random module if it is None, and has
+        <time_budget> milliseconds to choose each move, if it is not None.
+
+        Difficulty determines the number of moves searched deeper at each
+        position.
+
+        Preconditions:
+            - difficulty > 0
+            - depth > 0
+            - time_budget is None or time_budget >= 0
+        """
+        SmartPlayer.__init__(self, player_id, goal, difficulty, rng=rng,
+                             distinct=True, time_budget=time_budget)
+        self.depth = depth
+        self.opponents = [] if opponents is None else opponents
+        self.stats = {'nodes': 0, 'depth': 0, 'ms': 0.0}
+
+    def _choose_move(self, board: Block,
+                     cancelled: Optional[threading.Event] = None) -> \
+            Optional[Tuple[str, Optional[int], Block]]:
+        """Return the move that generate_move makes on <board>, or None if
+        <cancelled> is set before it is chosen.
+
+        <board> is changed while it is searched, and changed back.
+        """
+        start = time.perf_counter()
+        deadline = None
+        if self.time_budget is not None:
+            deadline = start + self.time_budget / 1000
+        rng = random if self._rng is None else self._rng
+        search = _Search(board, [self.goal] + self.opponents, self.table,
+                         self.difficulty, rng.getrandbits(32), deadline,
+                         cancelled)
+
+        best = _create_move(PASS, board)
+        depth = 0
+        try:
+            moves = search.moves(0)
+            best = moves[0][1]
+            depth = 1
+            for plies in range(2, self.depth + 1):
+                values = []
+                alpha = -math.inf
+                for _, move in moves[:self.difficulty]:
+                    if move[0] != PASS[0]:
+                        search.apply(move, 0)
+                    value = search.value(1 % len(search.goals), plies - 1,
+                                         alpha, math.inf)
+                    if move[0] != PASS[0]:
+                        search.undo(move, 0)
+                    values.append((value, move))
+                    alpha = max(alpha, value)
+                values.sort(key=lambda item: item[0], reverse=True)
+                moves = values + moves[self.difficulty:]
+                best = moves[0][1]
+                depth = plies
+        except _SearchTimeout:
+            search.undo_all()
+            if cancelled is not None and cancelled.is_set():
+                return None
+
+        self.candidates = search.nodes
+        self.stats = {'nodes': search.nodes, 'depth': depth,
+                      'ms': (time.perf_counter() - start) * 1000}
+        return best
+
 
 if __name__ == '__main__':
     import python_ta
@@ -464,8 +1372,13 @@ if __name__ == '__main__':
         'allowed-io': ['process_event'],
         'allowed-import-modules': [
             'doctest', 'python_ta', 'random', 'typing', 'actions', 'block',
-            'goal', 'pygame', '__future__'
+            'goal', 'pygame', '__future__', 'math', 'concurrent.futures',
+            'codec', 'itertools', 'move_index', 'multiprocessing',
+            'threading', 'time'
         ],
-        'max-attributes': 10,
+        'max-attributes': 12,
+        'max-args': 8,
+        'max-locals': 18,
+        'max-module-lines': 1400,
         'generated-members': 'pygame.*'
     })
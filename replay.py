@@ -0,0 +1,331 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains the move log of a game, and the replayer that plays a
+logged game again.
+
+A move log is a stream of lines of JSON, appended to as the game is played, so
+that nothing is kept in memory and many games can be logged one after the
+other to the same file. Each game is logged as:
+- a 'start' record, with the seed of the game (if any), the number of turns,
+  the initial board in the encoding of codec.encode, and each player's ID,
+  goal and colour,
+- a 'move' record for every successful move, with the ID of the player, the
+  action, the path of child indices from the board down to the Block it was
+  performed on, the seed the Block was smashed with (for a smash), and each
+  player's goal score and penalty after the move, and
+- an 'end' record, with the final scores and the winner.
+
+A logged game can be replayed as fast as its moves can be done, checking that
+every move gives the logged scores, or stepped through on screen with
+ReplayState.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, Optional, Tuple, TextIO, \
+    TYPE_CHECKING
+import base64
+import json
+
+from block import Block
+from blocky import AnimateMoveState, GameData, GameOverState, GameState
+from board_layer import BoardLayer
+from codec import decode, encode
+from goal import BlobGoal, PerimeterGoal
+from player import Player
+
+if TYPE_CHECKING:
+    import pygame
+    from renderer import Renderer
+
+# The goal classes that can be named in a move log, by name.
+_GOALS = {goal_type.__name__: goal_type
+          for goal_type in (PerimeterGoal, BlobGoal)}
+
+
+class MoveLog:
+    """An append-only log of the moves made in games of Blocky.
+
+    === Public Attributes ===
+    out:
+        The stream that the records of the log are written to.
+    """
+    out: TextIO
+
+    def __init__(self, out: TextIO) -> None:
+        """Initialize this log, writing its records to <out>.
+        """
+        self.out = out
+
+    def _write(self, record: Dict) -> None:
+        """Write <record> to this log as one line of JSON.
+        """
+        self.out.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def start(self, data: GameData, seed: Optional[int] = None) -> None:
+        """Start logging the game in <data>, which was set up from <seed>,
+        by writing its initial board and players.
+
+        From now on, every successful move in <data> is written to this log.
+
+        Precondition: no move has been made in <data> yet.
+        """
+        players = []
+        for player in data.players:
+            players.append({'id': player.id,
+                            'goal': type(player.goal).__name__,
+                            'colour': player.goal.colour})
+        self._write({
+            'event': 'start',
+            'seed': seed,
+            'max_turns': data.max_turns,
+            'board': base64.b64encode(encode(data.board)).decode('ascii'),
+            'players': players
+        })
+        data.log = self
+
+    def record_move(self, data: GameData, player: Player,
+                    move: Tuple[str, Optional[int], Block],
+                    seed: Optional[int] = None) -> None:
+        """Write <move>, which <player> has just made successfully in <data>,
+        smashing with <seed> if it is a smash.
+        """
+        record = {
+            'event': 'move',
+            'player': player.id,
+            'action': [move[0], move[1]],
+            'path': data.board._path_to(move[2])
+        }
+        if seed is not None:
+            record['seed'] = seed
+        record['scores'] = [data.calculate_score(p.id) for p in data.players]
+        self._write(record)
+
+    def finish(self, data: GameData) -> None:
+        """Write the final scores and winner of the game in <data>, and flush
+        this log.
+        """
+        scores, winner = data.final_scores()
+        self._write({'event': 'end', 'scores': scores, 'winner': winner})
+        self.out.flush()
+        data.log = None
+
+
+class _LoggedPlayer(Player):
+    """A player whose moves are read from a move log rather than chosen.
+    """
+
+    def get_selected_block(self, board: Block) -> Optional[Block]:
+        """Return None, since a logged player never selects a block.
+        """
+        return None
+
+    def process_event(self, event: pygame.event.Event) -> None:
+        """Ignore <event>.
+        """
+        return
+
+    def generate_move(self, board: Block) -> \
+            Optional[Tuple[str, Optional[int], Block]]:
+        """Return None, since the moves of a logged player are only read from
+        its log.
+        """
+        return None
+
+
+def read_records(lines: Iterable[str]) -> Iterator[Dict]:
+    """Return an iterator over the records of the move log in <lines>,
+    skipping blank lines.
+    """
+    for line in lines:
+        if line.strip() != '':
+            yield json.loads(line)
+
+
+def start_game(record: Dict) -> GameData:
+    """Return the game logged by the 'start' record <record>, before any
+    move is made.
+
+    Raise a ValueError if <record> is not a 'start' record.
+    """
+    if record.get('event') != 'start':
+        raise ValueError(f'Expected the start of a game, not {record}.')
+    board = decode(base64.b64decode(record['board']))
+    players = []
+    for player in record['players']:
+        goal = _GOALS[player['goal']](tuple(player['colour']))
+        players.append(_LoggedPlayer(player['id'], goal))
+    data = GameData(board, players)
+    data.max_turns = record['max_turns']
+    return data
+
+
+def apply_record(data: GameData, record: Dict) -> \
+        Tuple[Player, Tuple[str, Optional[int], Block]]:
+    """Make the move in the 'move' record <record> in <data>, and return the
+    player who made it and the move.
+
+    Raise a ValueError if the move cannot be made, or if it does not give the
+    scores in <record>.
+    """
+    player = data.players[record['player']]
+    block = data.board._follow(record['path'])
+    move = (record['action'][0], record['action'][1], block)
+
+    if not data.apply_move(player, move, record.get('seed')):
+        raise ValueError(f'The move in {record} cannot be made.')
+    for p, (goal_score, penalty) in zip(data.players, record['scores']):
+        if data.calculate_score(p.id) != (goal_score, penalty):
+            raise ValueError(f'Player {p.id} has a score of '
+                             f'{data.calculate_score(p.id)} after the move '
+                             f'in {record}.')
+    return player, move
+
+
+def _check_end(data: GameData, record: Dict) -> None:
+    """Raise a ValueError if the final scores and winner of <data> are not
+    the ones in the 'end' record <record>.
+    """
+    scores, winner = data.final_scores()
+    if [list(score) for score in scores] != record['scores'] or \
+            winner != record['winner']:
+        raise ValueError(f'The game ended with {scores} and winner {winner} '
+                         f'instead of {record}.')
+
+
+def replay_log(lines: Iterable[str]) -> Iterator[Tuple[Dict, GameData]]:
+    """Replay every game in the move log in <lines>, one after the other,
+    and yield the 'start' record and the final GameData of each.
+
+    No more than one game is kept in memory at a time, so a log of a whole
+    tournament can be checked as it is read.
+
+    Raise a ValueError if the log is not well formed, or if any move does not
+    give the logged scores. A game at the end of the log that was never
+    finished is not yielded.
+    """
+    start = None
+    data = None
+    for record in read_records(lines):
+        if data is None:
+            start = record
+            data = start_game(record)
+        elif record['event'] == 'move':
+            apply_record(data, record)
+        elif record['event'] == 'end':
+            _check_end(data, record)
+            yield start, data
+            start = None
+            data = None
+        else:
+            raise ValueError(f'Expected a move or the end of a game, not '
+                             f'{record}.')
+
+
+class ReplayState(GameState):
+    """A GameState that steps through a logged game, one move each time the
+    space bar or the right arrow key is pressed.
+    """
+    # === Private Attributes ===
+    # _data:
+    #   The game being replayed.
+    # _records:
+    #   The records of the log that have not been replayed yet.
+    # _num_moves:
+    #   The number of moves replayed so far.
+    # _step:
+    #   True iff the next move should be replayed.
+    # _layer:
+    #   The picture of the board, drawn again only where moves change it.
+    _data: GameData
+    _records: Iterator[Dict]
+    _num_moves: int
+    _step: bool
+    _layer: BoardLayer
+
+    def __init__(self, records: Iterator[Dict]) -> None:
+        """Initialize this GameState to replay the game that starts at the
+        next record of <records>.
+        """
+        self._records = records
+        self._data = start_game(next(records))
+        self._num_moves = 0
+        self._step = False
+        self._layer = BoardLayer()
+
+    def process_event(self, event: pygame.event.Event) -> None:
+        """Replay the next move when the space bar or the right arrow key is
+        pressed.
+        """
+        import pygame
+
+        if event.type == pygame.KEYDOWN and \
+                event.key in (pygame.K_SPACE, pygame.K_RIGHT):
+            self._step = True
+
+    def update(self) -> GameState:
+        """Update this GameState based on past events.
+
+        Return the next GameState that should be updated. This can be self.
+        """
+        if not self._step:
+            return self
+        self._step = False
+
+        record = next(self._records, None)
+        if record is None or record['event'] != 'move':
+            if record is not None:
+                _check_end(self._data, record)
+            return GameOverState(self._data)
+
+        background = self._data.squares()
+        player, move = apply_record(self._data, record)
+        self._layer.mark_dirty(move[2])
+        self._num_moves += 1
+        return AnimateMoveState(self, player.id, move, background)
+
+    def render(self, renderer: Renderer) -> None:
+        """Render the current state of the game onto the screen.
+        """
+        self._layer.draw(renderer, self._data.board, self._data.squares())
+        renderer.draw_status(f'Replay | Move {self._num_moves} | '
+                             f'Press space for the next move')
+
+    def render_key(self) -> Optional[Tuple]:
+        """Return a value that only changes when a move is replayed.
+        """
+        return self._data.board._version, self._num_moves
+
+    def idle_timeout(self) -> Optional[int]:
+        """Return None, since moves are only replayed in response to events.
+        """
+        return None
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'base64', 'json',
+            'pygame', 'actions', 'block', 'blocky', 'board_layer', 'codec',
+            'goal', 'player', 'renderer'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,282 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains a tournament runner, which plays many seeded games between
+computer players on all cores, for one or more configurations.
+
+The result of every game is appended to a file as one line of JSON as soon as
+the game is over, so a long tournament does not keep its games in memory and
+can be inspected while it runs. The moves of every game can also be written to
+a move log (see replay.py), so that the whole tournament can be replayed and
+checked. When the tournament is over, a table of win
+rates and scores is printed for each configuration, together with the
+throughput and the time each game took.
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional, TextIO, Tuple
+import io
+import json
+import multiprocessing
+import random
+import statistics
+import time
+
+from block import generate_board
+from blocky import GameData
+from goal import BlobGoal, PerimeterGoal
+from headless import play_game
+from player import Player, SmartPlayer, create_players
+from replay import MoveLog
+from settings import BOARD_SIZE, colour_name
+
+
+class Configuration:
+    """The setup of the games played for one part of a tournament.
+
+    === Public Attributes ===
+    name:
+        The name of this configuration, used to label its results.
+    max_depth:
+        The depth of the boards the games are played on.
+    num_random:
+        The number of random players in each game.
+    smart_players:
+        The difficulty of each smart player in each game.
+    goal_type:
+        The type of every player's goal, or None if it is chosen randomly for
+        each game.
+    num_turns:
+        The number of turns in each game.
+
+    === Representation Invariants ===
+    - 1 <= num_random + len(smart_players) <= len(COLOUR_LIST)
+    """
+    name: str
+    max_depth: int
+    num_random: int
+    smart_players: List[int]
+    goal_type: Optional[type]
+    num_turns: int
+
+    def __init__(self, name: str, max_depth: int, num_random: int,
+                 smart_players: List[int], goal_type: Optional[type] = None,
+                 num_turns: int = 5) -> None:
+        """Initialize this configuration with the given attributes.
+        """
+        self.name = name
+        self.max_depth = max_depth
+        self.num_random = num_random
+        self.smart_players = smart_players
+        self.goal_type = goal_type
+        self.num_turns = num_turns
+
+
+def _describe(player: Player) -> str:
+    """Return a short description of the kind of <player>, such as 'random'
+    or 'smart(10)'.
+    """
+    if isinstance(player, SmartPlayer):
+        return f'smart({player.difficulty})'
+    return 'random'
+
+
+def _play_seeded(job: Tuple[Configuration, int, int, bool]) -> Dict:
+    """Play the game given by <job>, which is its configuration, its number
+    within that configuration, its seed and whether it is logged, and return
+    its result as a dictionary that can be written as JSON.
+
+    If the game is logged, the result also maps 'log' to its move log.
+
+    This is run by the worker processes of the tournament. Everything random
+    in the game is drawn from random number generators seeded with its seed,
+    so it can be played again from its seed alone.
+    """
+    config, game, seed, logged = job
+    start = time.perf_counter()
+
+    rng = random.Random(seed)
+    board = generate_board(config.max_depth, BOARD_SIZE, rng)
+    players = create_players(0, config.num_random, config.smart_players,
+                             goal_type=config.goal_type, rng=rng)
+    data = GameData(board, players, rng)
+    data.max_turns = config.num_turns
+    if logged:
+        log = io.StringIO()
+        MoveLog(log).start(data, seed)
+    scores, winner = play_game(data)
+
+    result = []
+    for player, (_, goal_score, penalty) in zip(players, scores):
+        result.append({
+            'id': player.id,
+            'kind': _describe(player),
+            'goal': type(player.goal).__name__,
+            'colour': colour_name(player.goal.colour),
+            'score': goal_score - penalty,
+            'goal_score': goal_score,
+            'penalty': penalty
+        })
+    record = {
+        'config': config.name,
+        'game': game,
+        'seed': seed,
+        'players': result,
+        'winner': winner,
+        'seconds': time.perf_counter() - start
+    }
+    if logged:
+        record['log'] = log.getvalue()
+    return record
+
+
+def run_tournament(configs: List[Configuration], num_games: int, seed: int,
+                   out: TextIO, processes: Optional[int] = None,
+                   log: Optional[TextIO] = None) -> Dict:
+    """Play <num_games> games for each configuration in <configs> with
+    <processes> worker processes (one per core if it is None), write the
+    result of each game to <out> as one line of JSON as soon as it is over,
+    and return a summary of the tournament.
+
+    If <log> is given, the move log of each game is written to it as soon as
+    the game is over, one whole game after the other.
+
+    The seed of every game is drawn from <seed>, so the same tournament can be
+    played again, one game at a time if needed, from the seeds in <out>.
+
+    The summary maps 'configs' to a dictionary with the summary of each
+    configuration by name, which maps 'games' to the number of games, 'wins'
+    to the number of games won by each player ID, 'kinds' to the kind of
+    each player ID, 'scores' to the list of scores of each player ID, and
+    'seconds' to the time each game took. It also maps 'seconds' to the time
+    the whole tournament took.
+    """
+    rng = random.Random(seed)
+    jobs = []
+    for config in configs:
+        for game in range(num_games):
+            jobs.append((config, game, rng.getrandbits(32), log is not None))
+
+    summary = {}
+    for config in configs:
+        summary[config.name] = {'games': 0, 'wins': {}, 'kinds': {},
+                                'scores': {}, 'seconds': []}
+
+    start = time.perf_counter()
+    # Workers are spawned rather than forked, so that they never inherit the
+    # state of a display that this process may have opened.
+    with multiprocessing.get_context('spawn').Pool(processes) as pool:
+        for record in pool.imap_unordered(_play_seeded, jobs):
+            if log is not None:
+                log.write(record.pop('log'))
+                log.flush()
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+
+            config_summary = summary[record['config']]
+            config_summary['games'] += 1
+            config_summary['seconds'].append(record['seconds'])
+            for player in record['players']:
+                config_summary['kinds'][player['id']] = player['kind']
+                config_summary['scores'].setdefault(player['id'], []).append(
+                    player['score'])
+                config_summary['wins'].setdefault(player['id'], 0)
+            config_summary['wins'][record['winner']] += 1
+
+        # Let the workers exit by themselves: leaving the with statement
+        # terminates them with a signal, which they may not act on if this
+        # process set up handlers for it (as pygame.init does).
+        pool.close()
+        pool.join()
+
+    return {'configs': summary, 'seconds': time.perf_counter() - start}
+
+
+def format_summary(summary: Dict) -> str:
+    """Return the tables of win rates and score distributions for each
+    configuration in <summary>, as returned by run_tournament, followed by
+    the throughput and the latency of its games.
+    """
+    lines = []
+    total_games = 0
+    all_seconds = []
+    for name, config_summary in summary['configs'].items():
+        games = config_summary['games']
+        total_games += games
+        all_seconds.extend(config_summary['seconds'])
+
+        lines.append(f'=== {name} ({games} games) ===')
+        lines.append(f'{"player":<14}{"win rate":>9}{"mean":>8}{"min":>6}'
+                     f'{"q1":>6}{"median":>8}{"q3":>6}{"max":>6}')
+        for player_id in sorted(config_summary['scores']):
+            scores = config_summary['scores'][player_id]
+            label = f'{player_id}: {config_summary["kinds"][player_id]}'
+            win_rate = config_summary['wins'][player_id] / games
+            q1, median, q3 = _quartiles(scores)
+            lines.append(f'{label:<14}{win_rate:>9.1%}'
+                         f'{statistics.mean(scores):>8.1f}{min(scores):>6}'
+                         f'{q1:>6.1f}{median:>8.1f}{q3:>6.1f}'
+                         f'{max(scores):>6}')
+        lines.append('')
+
+    if total_games > 0:
+        all_seconds.sort()
+        lines.append(f'{total_games} games in {summary["seconds"]:.2f}s: '
+                     f'{total_games / summary["seconds"]:.1f} games/s')
+        p95 = all_seconds[min(len(all_seconds) - 1,
+                              int(0.95 * len(all_seconds)))]
+        lines.append(f'Seconds per game: mean '
+                     f'{statistics.mean(all_seconds):.4f}, median '
+                     f'{statistics.median(all_seconds):.4f}, p95 '
+                     f'{p95:.4f}, max {all_seconds[-1]:.4f}')
+    return '\n'.join(lines)
+
+
+def _quartiles(scores: List[int]) -> Tuple[float, float, float]:
+    """Return the first quartile, median and third quartile of <scores>.
+    """
+    if len(scores) == 1:
+        return scores[0], scores[0], scores[0]
+    q1, median, q3 = statistics.quantiles(scores, n=4)
+    return q1, median, q3
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['run_tournament'],
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'io', 'json',
+            'multiprocessing', 'random', 'statistics', 'time', 'block',
+            'blocky', 'goal', 'headless', 'player', 'replay', 'settings'
+        ],
+        'max-args': 6,
+        'max-locals': 18
+    })
+
+    # Compare smart players of different difficulty with a random player, on
+    # each type of goal.
+    sample_configs = [
+        Configuration('perimeter', 3, 1, [5, 10], PerimeterGoal),
+        Configuration('blob', 3, 1, [5, 10], BlobGoal)
+    ]
+    with open('tournament.jsonl', 'a') as results:
+        print(format_summary(run_tournament(sample_configs, 20, 148,
+                                            results)))